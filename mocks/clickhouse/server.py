@@ -3,11 +3,17 @@ Mock ClickHouse server providing analytical database functionality.
 """
 
 import json
+import re
 import time
-from typing import Dict, Any, Optional, List, Union
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, Optional, List, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+import numpy as np
 from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+import orjson
 from pydantic import BaseModel
 import sys
 import os
@@ -18,12 +24,215 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from shared.logging import get_logger
 
 
-@dataclass
+# Single-pass SELECT parser: table, optional WHERE and optional LIMIT
+_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(?P<cols>.+?)\s+FROM\s+(?P<table>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Output format streamed as newline-delimited JSON (one row per line)
+STREAMING_FORMAT = "JSONEachRow"
+
+# Rows materialized at a time when streaming a result
+STREAM_CHUNK_SIZE = 1024
+
+# Maximum number of cached SELECT results
+QUERY_CACHE_SIZE = 1024
+
+# Sample pricing data: PRICING_STEPS 5-minute ticks for each instrument
+PRICING_INSTRUMENTS = ("INST001", "INST002", "INST003")
+PRICING_STEPS = 1000
+
+# Numeric pricing columns that can be shared read-only between worker processes
+# (timestamps are stored as epoch seconds and formatted per worker)
+SHARED_PRICING_COLUMNS = {
+    "timestamp": np.int64,
+    "price": np.float64,
+    "volume": np.float64,
+    "bid": np.float64,
+    "ask": np.float64,
+}
+SHARED_MEMORY_PREFIX = "mock_ch_pricing_"
+
+# ClickHouse column types stored as typed NumPy arrays; everything else is object.
+_NUMERIC_DTYPES = {
+    "Float64": np.float64,
+    "Float32": np.float32,
+    "Int64": np.int64,
+    "UInt64": np.uint64,
+}
+
+
+def _column_array(values: List[Any], column_type: str) -> np.ndarray:
+    """Build a column array for the given ClickHouse type."""
+    dtype = _NUMERIC_DTYPES.get(column_type)
+    if dtype is not None and all(value is not None for value in values):
+        try:
+            return np.asarray(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+@dataclass(slots=True)
 class MockTable:
-    """Mock ClickHouse table."""
+    """Mock ClickHouse table stored column-wise (one array per column)."""
     name: str
     columns: Dict[str, str]  # column_name -> type
-    data: List[Dict[str, Any]] = field(default_factory=list)
+    data: Dict[str, np.ndarray] = field(default_factory=dict)  # column_name -> values
+    version: int = 0  # bumped on every insert; part of the query cache key
+    indexed_columns: Tuple[str, ...] = ()
+    indexes: Dict[str, Dict[Any, List[int]]] = field(default_factory=dict)  # column -> value -> row ids
+    # Derived from the (immutable) schema once, at creation
+    column_names: Tuple[str, ...] = field(init=False)
+    describe_payload: List[Dict[str, str]] = field(init=False)
+
+    def __post_init__(self):
+        self.column_names = tuple(self.columns)
+        self.describe_payload = [
+            {"name": col_name, "type": col_type}
+            for col_name, col_type in self.columns.items()
+        ]
+        for column_name, column_type in self.columns.items():
+            if column_name not in self.data:
+                self.data[column_name] = _column_array([], column_type)
+        for column_name in self.indexed_columns:
+            self.indexes.setdefault(column_name, {})
+
+    @property
+    def row_count(self) -> int:
+        """Number of rows in the table."""
+        return len(next(iter(self.data.values()))) if self.data else 0
+
+    def append_rows(self, rows: List[Dict[str, Any]]):
+        """Append row dicts to the column arrays."""
+        if not rows:
+            return
+        self.append_columns({
+            column_name: [row.get(column_name) for row in rows]
+            for column_name in self.columns
+        })
+
+    def append_columns(self, values: Dict[str, Any]):
+        """Append equal-length column sequences; missing columns are filled with None."""
+        row_count = len(next(iter(values.values()))) if values else 0
+        if not row_count:
+            return
+        start = self.row_count
+        for column_name, index in self.indexes.items():
+            column_values = values.get(column_name)
+            if column_values is None:
+                index.setdefault(None, []).extend(range(start, start + row_count))
+                continue
+            for row_id, value in enumerate(column_values, start):
+                index.setdefault(value, []).append(row_id)
+        for column_name, column_type in self.columns.items():
+            column_values = values.get(column_name)
+            if column_values is None:
+                column_values = [None] * row_count
+            new_values = column_values if isinstance(column_values, np.ndarray) else _column_array(list(column_values), column_type)
+            current = self.data[column_name]
+            if not len(current) and current.dtype == new_values.dtype:
+                # Adopt the array as-is (it may be a read-only shared-memory view)
+                self.data[column_name] = new_values
+                continue
+            if current.dtype != new_values.dtype:
+                current = current.astype(object)
+                new_values = new_values.astype(object)
+            self.data[column_name] = np.concatenate((current, new_values))
+        self.version += 1
+
+    def lookup(self, column_name: str, value: Any, limit: Optional[int] = None) -> np.ndarray:
+        """Return ids of the first `limit` rows where column equals value."""
+        index = self.indexes.get(column_name)
+        if index is not None:
+            return np.asarray(index.get(value, ())[:limit], dtype=np.intp)
+        column = self.data.get(column_name)
+        if column is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(column == value)[:limit]
+
+    def rows(self, indices: Union[np.ndarray, slice, None] = None) -> List[Dict[str, Any]]:
+        """Materialize row dicts for the given row ids or slice (all rows if omitted)."""
+        names = self.column_names
+        if indices is None:
+            column_values = [self.data[name].tolist() for name in names]
+        else:
+            column_values = [self.data[name][indices].tolist() for name in names]
+        return [dict(zip(names, values)) for values in zip(*column_values)]
+
+    def iter_rows(
+        self,
+        indices: Union[np.ndarray, slice, None] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield row dicts, materializing at most chunk_size rows at a time."""
+        if indices is None or isinstance(indices, slice):
+            start, stop, _ = (indices or slice(None)).indices(self.row_count)
+            chunks = (slice(i, min(i + chunk_size, stop)) for i in range(start, stop, chunk_size))
+        else:
+            chunks = (indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size))
+        for chunk in chunks:
+            yield from self.rows(chunk)
+
+
+def _generate_pricing_columns() -> Dict[str, np.ndarray]:
+    """Generate the numeric sample pricing columns, one array per column."""
+    base_time = datetime.now() - timedelta(days=30)
+    steps = np.arange(PRICING_STEPS)
+    instrument_count = len(PRICING_INSTRUMENTS)
+    timestamps = np.datetime64(base_time.replace(microsecond=0), "s") + steps * np.timedelta64(300, "s")
+    
+    # (step, instrument) grid flattened step-major, matching row order
+    base_prices = np.array([50.0, 45.0, 3.0]) + np.array([(hash(instrument) % 10) * 0.1 for instrument in PRICING_INSTRUMENTS])
+    prices = steps[:, np.newaxis] * 0.01 + base_prices
+    
+    return {
+        "timestamp": np.repeat(timestamps.astype(np.int64), instrument_count),
+        "price": np.round(prices, 2).ravel(),
+        "volume": np.repeat(1000.0 + (steps % 100) * 10, instrument_count),
+        "bid": np.round(prices - 0.01, 2).ravel(),
+        "ask": np.round(prices + 0.01, 2).ravel(),
+    }
+
+
+def publish_shared_pricing_data() -> List[shared_memory.SharedMemory]:
+    """Generate the sample pricing columns once and publish them to shared memory.
+    
+    The caller owns the returned segments and must close() and unlink() them.
+    """
+    segments = []
+    for column_name, values in _generate_pricing_columns().items():
+        segment = shared_memory.SharedMemory(
+            name=SHARED_MEMORY_PREFIX + column_name, create=True, size=values.nbytes
+        )
+        np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[:] = values
+        segments.append(segment)
+    return segments
+
+
+def _attach_shared_pricing_data() -> Optional[Tuple[Dict[str, np.ndarray], List[shared_memory.SharedMemory]]]:
+    """Map published pricing columns read-only, or return None if not published."""
+    row_count = PRICING_STEPS * len(PRICING_INSTRUMENTS)
+    columns: Dict[str, np.ndarray] = {}
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        for column_name, dtype in SHARED_PRICING_COLUMNS.items():
+            segment = shared_memory.SharedMemory(name=SHARED_MEMORY_PREFIX + column_name)
+            segments.append(segment)
+            values = np.ndarray((row_count,), dtype=dtype, buffer=segment.buf)
+            values.flags.writeable = False
+            columns[column_name] = values
+    except FileNotFoundError:
+        columns.clear()
+        for segment in segments:
+            segment.close()
+        return None
+    return columns, segments
 
 
 class MockClickHouseServer:
@@ -32,12 +241,27 @@ class MockClickHouseServer:
     def __init__(self, port: int = 8123):
         self.port = port
         self.logger = get_logger("mock.clickhouse")
-        self.app = FastAPI(title="Mock ClickHouse", version="1.0.0")
+        self.app = FastAPI(
+            title="Mock ClickHouse",
+            version="1.0.0",
+            default_response_class=ORJSONResponse
+        )
         
         # In-memory storage
         self.tables: Dict[str, MockTable] = {}
         self.databases: Dict[str, List[str]] = {"default": []}
         
+        # SELECT result cache: (database, normalized query, table version) -> result
+        self._query_cache: "OrderedDict[Tuple[str, str, int], Dict[str, Any]]" = OrderedDict()
+        
+        # Serialized metadata responses, rebuilt after inserts/DDL
+        self._root_response: Optional[Response] = None
+        self._databases_payload: Optional[bytes] = None
+        self._tables_payloads: Dict[str, bytes] = {}
+        
+        # Shared-memory segments backing the pricing columns (kept open while mapped)
+        self._shared_segments: List[shared_memory.SharedMemory] = []
+        
         # Create default tables with sample data
         self._create_default_tables()
         
@@ -98,7 +322,7 @@ class MockClickHouseServer:
             }
         ]
         
-        instruments_table.data = instruments_data
+        instruments_table.append_rows(instruments_data)
         self.tables["instruments"] = instruments_table
         
         # Pricing data table
@@ -112,30 +336,30 @@ class MockClickHouseServer:
                 "bid": "Float64",
                 "ask": "Float64",
                 "tenant_id": "String"
-            }
+            },
+            indexed_columns=("tenant_id", "instrument_id")
         )
         
-        # Generate sample pricing data
-        pricing_data = []
-        base_time = datetime.now() - timedelta(days=30)
-        
-        for i in range(1000):
-            timestamp = base_time + timedelta(minutes=i * 5)
-            for instrument in ["INST001", "INST002", "INST003"]:
-                base_price = 50.0 if instrument == "INST001" else 45.0 if instrument == "INST002" else 3.0
-                price = base_price + (i * 0.01) + (hash(instrument) % 10) * 0.1
-                
-                pricing_data.append({
-                    "instrument_id": instrument,
-                    "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                    "price": round(price, 2),
-                    "volume": round(1000 + (i % 100) * 10, 2),
-                    "bid": round(price - 0.01, 2),
-                    "ask": round(price + 0.01, 2),
-                    "tenant_id": "tenant-1"
-                })
-        
-        pricing_table.data = pricing_data
+        # Sample pricing data: map the shared copy if one was published, else generate
+        shared = _attach_shared_pricing_data()
+        if shared is None:
+            pricing_columns = _generate_pricing_columns()
+        else:
+            pricing_columns, self._shared_segments = shared
+        
+        instrument_count = len(PRICING_INSTRUMENTS)
+        step_seconds = pricing_columns["timestamp"][::instrument_count].astype("datetime64[s]")
+        timestamps = np.char.replace(np.datetime_as_string(step_seconds, unit="s"), "T", " ").astype(object)
+        
+        pricing_table.append_columns({
+            "instrument_id": np.tile(np.array(PRICING_INSTRUMENTS, dtype=object), len(step_seconds)),
+            "timestamp": np.repeat(timestamps, instrument_count),
+            "price": pricing_columns["price"],
+            "volume": pricing_columns["volume"],
+            "bid": pricing_columns["bid"],
+            "ask": pricing_columns["ask"],
+            "tenant_id": np.full(len(pricing_columns["price"]), "tenant-1", dtype=object)
+        })
         self.tables["pricing_data"] = pricing_table
         
         # Curves table
@@ -149,13 +373,15 @@ class MockClickHouseServer:
                 "price": "Float64",
                 "timestamp": "DateTime",
                 "tenant_id": "String"
-            }
+            },
+            indexed_columns=("tenant_id",)
         )
         
         # Sample curves data
         curves_data = []
         tenors = ["1M", "3M", "6M", "1Y", "2Y", "5Y"]
         commodities = ["oil", "gas", "power"]
+        curve_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         for commodity in commodities:
             for i, tenor in enumerate(tenors):
@@ -168,11 +394,11 @@ class MockClickHouseServer:
                     "commodity": commodity,
                     "tenor": tenor,
                     "price": round(price, 2),
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "timestamp": curve_timestamp,
                     "tenant_id": "tenant-1"
                 })
         
-        curves_table.data = curves_data
+        curves_table.append_rows(curves_data)
         self.tables["curves"] = curves_table
         
         # Add tables to default database
@@ -184,26 +410,33 @@ class MockClickHouseServer:
         @self.app.get("/")
         async def root():
             """Root endpoint."""
-            return {
-                "service": "mock-clickhouse",
-                "message": "Mock ClickHouse server for 254Carbon Access Layer",
-                "version": "1.0.0",
-                "databases": list(self.databases.keys()),
-                "tables": list(self.tables.keys())
-            }
+            if self._root_response is None:
+                self._root_response = Response(
+                    orjson.dumps({
+                        "service": "mock-clickhouse",
+                        "message": "Mock ClickHouse server for 254Carbon Access Layer",
+                        "version": "1.0.0",
+                        "databases": list(self.databases.keys()),
+                        "tables": list(self.tables.keys())
+                    }),
+                    media_type="application/json"
+                )
+            return self._root_response
         
         @self.app.get("/databases")
         async def list_databases():
             """List databases."""
-            return {
-                "databases": [
-                    {
-                        "name": db_name,
-                        "tables": tables
-                    }
-                    for db_name, tables in self.databases.items()
-                ]
-            }
+            if self._databases_payload is None:
+                self._databases_payload = orjson.dumps({
+                    "databases": [
+                        {
+                            "name": db_name,
+                            "tables": tables
+                        }
+                        for db_name, tables in self.databases.items()
+                    ]
+                })
+            return Response(self._databases_payload, media_type="application/json")
         
         @self.app.get("/tables")
         async def list_tables(database: str = Query("default")):
@@ -211,49 +444,38 @@ class MockClickHouseServer:
             if database not in self.databases:
                 raise HTTPException(status_code=404, detail="Database not found")
             
-            tables_info = []
-            for table_name in self.databases[database]:
-                if table_name in self.tables:
-                    table = self.tables[table_name]
-                    tables_info.append({
-                        "name": table.name,
-                        "columns": table.columns,
-                        "row_count": len(table.data)
-                    })
+            payload = self._tables_payloads.get(database)
+            if payload is None:
+                tables_info = []
+                for table_name in self.databases[database]:
+                    if table_name in self.tables:
+                        table = self.tables[table_name]
+                        tables_info.append({
+                            "name": table.name,
+                            "columns": table.columns,
+                            "row_count": table.row_count
+                        })
+                payload = self._tables_payloads[database] = orjson.dumps({"tables": tables_info})
             
-            return {"tables": tables_info}
+            return Response(payload, media_type="application/json")
         
         @self.app.post("/query")
         async def execute_query(
             query: str = Body(..., embed=True),
-            database: str = Query("default")
+            database: str = Query("default"),
+            default_format: Optional[str] = Query(None)
         ):
             """Execute SQL query."""
-            if database not in self.databases:
-                raise HTTPException(status_code=404, detail="Database not found")
-            
-            try:
-                result = self._execute_query(query, database)
-                return result
-            except Exception as e:
-                self.logger.error(f"Query execution error: {e}")
-                raise HTTPException(status_code=400, detail=str(e))
+            return self._run_query(query, database, default_format)
         
         @self.app.get("/query")
         async def execute_query_get(
             query: str = Query(...),
-            database: str = Query("default")
+            database: str = Query("default"),
+            default_format: Optional[str] = Query(None)
         ):
             """Execute SQL query via GET."""
-            if database not in self.databases:
-                raise HTTPException(status_code=404, detail="Database not found")
-            
-            try:
-                result = self._execute_query(query, database)
-                return result
-            except Exception as e:
-                self.logger.error(f"Query execution error: {e}")
-                raise HTTPException(status_code=400, detail=str(e))
+            return self._run_query(query, database, default_format)
         
         @self.app.post("/tables/{table_name}/insert")
         async def insert_data(
@@ -277,81 +499,123 @@ class MockClickHouseServer:
                         raise HTTPException(status_code=400, detail=f"Column '{column}' not found in table")
             
             # Insert data
-            table.data.extend(data)
+            table.append_rows(data)
+            self._invalidate_metadata()
             
             return {
                 "message": f"Inserted {len(data)} rows into table '{table_name}'",
-                "total_rows": len(table.data)
+                "total_rows": table.row_count
             }
     
+    def _invalidate_metadata(self):
+        """Drop cached metadata responses after a data or schema change."""
+        self._root_response = None
+        self._databases_payload = None
+        self._tables_payloads.clear()
+    
+    def _run_query(self, query: str, database: str, default_format: Optional[str]):
+        """Run a query for the HTTP handlers, streaming SELECTs when JSONEachRow is requested."""
+        if database not in self.databases:
+            raise HTTPException(status_code=404, detail="Database not found")
+        
+        try:
+            if default_format == STREAMING_FORMAT and query.lstrip()[:6].upper() == "SELECT":
+                table, indices = self._plan_select(self._parse_select(query))
+                return StreamingResponse(
+                    (orjson.dumps(row) + b"\n" for row in table.iter_rows(indices)),
+                    media_type="application/x-ndjson"
+                )
+            return self._execute_query(query, database)
+        except Exception as e:
+            self.logger.error(f"Query execution error: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+    
     def _execute_query(self, query: str, database: str) -> Dict[str, Any]:
         """Execute SQL query."""
-        query = query.strip().upper()
-        
-        if query.startswith("SELECT"):
-            return self._execute_select(query, database)
-        elif query.startswith("SHOW TABLES"):
+        # Keywords are matched case-insensitively; identifiers and literals keep their case
+        query = query.strip()
+        tokens = query.split(None, 2)  # tokenized once: keyword(s) and the rest
+        statement = " ".join(tokens[:2]).upper()
+        
+        if statement.startswith("SELECT"):
+            return self._execute_cached_select(query, database)
+        elif statement.startswith("SHOW TABLES"):
             return self._execute_show_tables(database)
-        elif query.startswith("DESCRIBE") or query.startswith("DESC"):
-            return self._execute_describe(query, database)
-        elif query.startswith("CREATE TABLE"):
+        elif statement.startswith("DESC"):
+            return self._execute_describe(tokens, database)
+        elif statement.startswith("CREATE TABLE"):
             return self._execute_create_table(query, database)
         else:
             raise ValueError(f"Unsupported query type: {query}")
     
-    def _execute_select(self, query: str, database: str) -> Dict[str, Any]:
-        """Execute SELECT query."""
+    def _execute_cached_select(self, query: str, database: str) -> Dict[str, Any]:
+        """Execute SELECT query, reusing results until the table changes."""
+        match = self._parse_select(query)
+        table = self.tables.get(match["table"])
+        if table is None:
+            return self._execute_select(match, database)
+        
+        cache_key = (database, query, table.version)
+        result = self._query_cache.get(cache_key)
+        if result is None:
+            result = self._execute_select(match, database)
+            self._query_cache[cache_key] = result
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        else:
+            self._query_cache.move_to_end(cache_key)
+        
+        # Shallow copy: the cached rows are never mutated by the handlers
+        return dict(result)
+    
+    def _parse_select(self, query: str) -> "re.Match[str]":
+        """Parse a SELECT query in a single regex pass."""
         # Simple query parsing (very basic)
-        if "FROM" not in query:
-            raise ValueError("SELECT query must include FROM clause")
+        match = _SELECT_RE.match(query)
+        if match is None:
+            raise ValueError("SELECT query must be of the form SELECT ... FROM <table> [WHERE ...] [LIMIT n]")
+        return match
+    
+    def _execute_select(self, match: "re.Match[str]", database: str) -> Dict[str, Any]:
+        """Execute a parsed SELECT query."""
+        table, indices = self._plan_select(match)
         
-        # Extract table name
-        parts = query.split()
-        from_index = parts.index("FROM")
-        if from_index + 1 >= len(parts):
-            raise ValueError("FROM clause missing table name")
+        # Only the returned slice is materialized as row dicts
+        filtered_data = table.rows(indices)
         
-        table_name = parts[from_index + 1].strip(";")
+        return {
+            "data": filtered_data,
+            "rows": len(filtered_data),
+            "columns": table.column_names
+        }
+    
+    def _plan_select(self, match: "re.Match[str]") -> Tuple[MockTable, Union[np.ndarray, slice]]:
+        """Resolve a parsed SELECT to its table and the selected row ids (or slice)."""
+        table_name = match["table"]
         
         if table_name not in self.tables:
             raise ValueError(f"Table '{table_name}' not found")
         
         table = self.tables[table_name]
+        where_clause = match["where"]
+        limit = int(match["limit"]) if match["limit"] else None
         
-        # Simple WHERE clause parsing
-        where_clause = None
-        if "WHERE" in query:
-            where_index = parts.index("WHERE")
-            if where_index + 1 < len(parts):
-                where_clause = " ".join(parts[where_index + 1:]).strip(";")
-        
-        # Simple LIMIT parsing
-        limit = None
-        if "LIMIT" in query:
-            limit_index = parts.index("LIMIT")
-            if limit_index + 1 < len(parts):
-                limit = int(parts[limit_index + 1])
-        
-        # Filter data
-        filtered_data = table.data.copy()
+        # Filter data by row ids (index lookup or column mask)
+        indices = None
         
         if where_clause:
             # Simple WHERE clause handling
-            if "tenant_id" in where_clause:
+            if "tenant_id" in where_clause.lower():
                 # Extract tenant_id value
                 if "=" in where_clause:
-                    tenant_value = where_clause.split("=")[1].strip().strip("'\"")
-                    filtered_data = [row for row in filtered_data if row.get("tenant_id") == tenant_value]
+                    tenant_value = where_clause.split("=", 1)[1].strip().strip("'\"")
+                    indices = table.lookup("tenant_id", tenant_value, limit)
         
-        # Apply limit
-        if limit:
-            filtered_data = filtered_data[:limit]
+        if indices is None:
+            # No filter: LIMIT is a view over the leading rows, nothing is copied
+            indices = slice(limit)
         
-        return {
-            "data": filtered_data,
-            "rows": len(filtered_data),
-            "columns": list(table.columns.keys())
-        }
+        return table, indices
     
     def _execute_show_tables(self, database: str) -> Dict[str, Any]:
         """Execute SHOW TABLES query."""
@@ -364,13 +628,12 @@ class MockClickHouseServer:
             "columns": ["name"]
         }
     
-    def _execute_describe(self, query: str, database: str) -> Dict[str, Any]:
-        """Execute DESCRIBE query."""
-        parts = query.split()
-        if len(parts) < 2:
+    def _execute_describe(self, tokens: List[str], database: str) -> Dict[str, Any]:
+        """Execute DESCRIBE query from its tokens."""
+        if len(tokens) < 2:
             raise ValueError("DESCRIBE query missing table name")
         
-        table_name = parts[1].strip(";")
+        table_name = tokens[1].strip(";")
         
         if table_name not in self.tables:
             raise ValueError(f"Table '{table_name}' not found")
@@ -378,11 +641,8 @@ class MockClickHouseServer:
         table = self.tables[table_name]
         
         return {
-            "data": [
-                {"name": col_name, "type": col_type}
-                for col_name, col_type in table.columns.items()
-            ],
-            "rows": len(table.columns),
+            "data": table.describe_payload,
+            "rows": len(table.describe_payload),
             "columns": ["name", "type"]
         }
     
@@ -404,4 +664,20 @@ def create_app():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(create_app(), host="0.0.0.0", port=8123)
+    workers = int(os.getenv("WORKERS", "1"))
+    # Build the sample data once and let every worker map it read-only
+    segments = publish_shared_pricing_data() if workers > 1 else []
+    try:
+        uvicorn.run(
+            "mocks.clickhouse.server:create_app",
+            factory=True,
+            host="0.0.0.0",
+            port=8123,
+            loop="uvloop",
+            http="httptools",
+            workers=workers
+        )
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
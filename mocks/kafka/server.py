@@ -3,14 +3,18 @@ Mock Kafka server providing in-memory message broker functionality.
 """
 
 import asyncio
-import json
+import itertools
 import time
 import uuid
-from typing import Dict, Any, Optional, List, Set, Callable
+import zlib
+from collections import deque
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Mapping, Set, Callable, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+import orjson
 import sys
 import os
 
@@ -19,29 +23,55 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from shared.logging import get_logger
 
+# Messages retained per topic; older messages are dropped like log retention
+MAX_TOPIC_MESSAGES = 100_000
 
-@dataclass
+# Per-connection WebSocket send queue size and max messages per frame
+WEBSOCKET_QUEUE_SIZE = 1024
+WEBSOCKET_BATCH_SIZE = 64
+
+# Shared read-only headers for messages produced without headers
+_EMPTY_HEADERS: Mapping[str, str] = MappingProxyType({})
+
+
+@dataclass(slots=True)
 class MockMessage:
     """Mock Kafka message."""
     topic: str
     partition: int
     offset: int
     key: Optional[str]
-    value: bytes
+    value: str  # payloads are text; stored as-is to avoid UTF-8 round-trips
     timestamp: Optional[int]
-    headers: Dict[str, str] = field(default_factory=dict)
+    headers: Mapping[str, str] = field(default_factory=lambda: _EMPTY_HEADERS)
 
 
-@dataclass
+@dataclass(slots=True)
 class MockTopic:
     """Mock Kafka topic."""
     name: str
     partitions: int
-    messages: List[MockMessage] = field(default_factory=list)
+    messages: deque = field(default_factory=lambda: deque(maxlen=MAX_TOPIC_MESSAGES))
     next_offset: int = 0
+    next_partition: int = 0  # round-robin cursor for keyless messages
+
+    def assign_partition(self, key: Optional[str]) -> int:
+        """Pick a partition: stable key hash for keyed messages, round-robin otherwise."""
+        if self.partitions <= 1:
+            return 0
+        if key is not None:
+            return zlib.crc32(key.encode('utf-8')) % self.partitions
+        partition = self.next_partition
+        self.next_partition = (partition + 1) % self.partitions
+        return partition
 
+    @property
+    def base_offset(self) -> int:
+        """Offset of the oldest retained message."""
+        return self.next_offset - len(self.messages)
 
-@dataclass
+
+@dataclass(slots=True)
 class MockConsumerGroup:
     """Mock Kafka consumer group."""
     group_id: str
@@ -56,15 +86,25 @@ class MockKafkaServer:
     def __init__(self, port: int = 9092):
         self.port = port
         self.logger = get_logger("mock.kafka")
-        self.app = FastAPI(title="Mock Kafka", version="1.0.0")
+        self.app = FastAPI(
+            title="Mock Kafka",
+            version="1.0.0",
+            default_response_class=ORJSONResponse
+        )
         
         # In-memory storage
         self.topics: Dict[str, MockTopic] = {}
         self.consumer_groups: Dict[str, MockConsumerGroup] = {}
-        self.subscribers: Dict[str, List[Callable]] = {}  # topic -> subscribers
+        self.subscribers: Dict[str, Dict[str, Callable]] = {}  # topic -> subscriber_id -> callback
+        
+        # Serialized listing responses, rebuilt after topics/groups change
+        self._root_response: Optional[Response] = None
+        self._topics_payload: Optional[bytes] = None
+        self._consumer_groups_payload: Optional[bytes] = None
         
         # WebSocket connections for streaming
-        self.websocket_connections: Dict[str, WebSocket] = {}
+        # connection_id -> (websocket, send queue, pump task)
+        self.websocket_connections: Dict[str, Tuple[WebSocket, asyncio.Queue, asyncio.Task]] = {}
         
         # Default topics
         self._create_default_topics()
@@ -90,27 +130,34 @@ class MockKafkaServer:
         @self.app.get("/")
         async def root():
             """Root endpoint."""
-            return {
-                "service": "mock-kafka",
-                "message": "Mock Kafka server for 254Carbon Access Layer",
-                "version": "1.0.0",
-                "topics": list(self.topics.keys()),
-                "consumer_groups": list(self.consumer_groups.keys())
-            }
+            if self._root_response is None:
+                self._root_response = Response(
+                    orjson.dumps({
+                        "service": "mock-kafka",
+                        "message": "Mock Kafka server for 254Carbon Access Layer",
+                        "version": "1.0.0",
+                        "topics": list(self.topics.keys()),
+                        "consumer_groups": list(self.consumer_groups.keys())
+                    }),
+                    media_type="application/json"
+                )
+            return self._root_response
         
         @self.app.get("/topics")
         async def list_topics():
             """List all topics."""
-            return {
-                "topics": [
-                    {
-                        "name": topic.name,
-                        "partitions": topic.partitions,
-                        "message_count": len(topic.messages)
-                    }
-                    for topic in self.topics.values()
-                ]
-            }
+            if self._topics_payload is None:
+                self._topics_payload = orjson.dumps({
+                    "topics": [
+                        {
+                            "name": topic.name,
+                            "partitions": topic.partitions,
+                            "message_count": len(topic.messages)
+                        }
+                        for topic in self.topics.values()
+                    ]
+                })
+            return Response(self._topics_payload, media_type="application/json")
         
         @self.app.post("/topics/{topic_name}")
         async def create_topic_endpoint(topic_name: str, partitions: int = Query(1)):
@@ -145,7 +192,7 @@ class MockKafkaServer:
             if topic_name not in self.topics:
                 raise HTTPException(status_code=404, detail="Topic not found")
             
-            message_id = self.produce(topic_name, key, message.encode('utf-8'))
+            message_id = self.produce(topic_name, key, message)
             return {
                 "message_id": message_id,
                 "topic": topic_name,
@@ -171,9 +218,9 @@ class MockKafkaServer:
                         "partition": msg.partition,
                         "offset": msg.offset,
                         "key": msg.key,
-                        "value": msg.value.decode('utf-8'),
+                        "value": msg.value,
                         "timestamp": msg.timestamp,
-                        "headers": msg.headers
+                        "headers": msg.headers or {}
                     }
                     for msg in messages
                 ]
@@ -189,11 +236,18 @@ class MockKafkaServer:
                 return
             
             connection_id = str(uuid.uuid4())
-            self.websocket_connections[connection_id] = websocket
+            queue: asyncio.Queue = asyncio.Queue(maxsize=WEBSOCKET_QUEUE_SIZE)
+            pump = asyncio.create_task(self._pump_websocket(connection_id, websocket, queue))
+            self.websocket_connections[connection_id] = (websocket, queue, pump)
+            loop = asyncio.get_running_loop()
             
             try:
-                # Subscribe to topic
-                self.subscribe(topic_name, lambda msg: self._send_to_websocket(connection_id, msg))
+                # Subscribe to topic; producers only enqueue, the pump task sends
+                self.subscribe(
+                    topic_name,
+                    lambda msg, q=queue: loop.call_soon_threadsafe(self._enqueue_message, q, msg),
+                    subscriber_id=connection_id
+                )
                 
                 # Keep connection alive
                 while True:
@@ -208,24 +262,27 @@ class MockKafkaServer:
                 self.logger.error("WebSocket error", error=str(e))
             finally:
                 # Cleanup
-                if connection_id in self.websocket_connections:
-                    del self.websocket_connections[connection_id]
                 self.unsubscribe(topic_name, connection_id)
+                connection = self.websocket_connections.pop(connection_id, None)
+                if connection is not None:
+                    connection[2].cancel()
         
         @self.app.get("/consumer-groups")
         async def list_consumer_groups():
             """List consumer groups."""
-            return {
-                "consumer_groups": [
-                    {
-                        "group_id": group.group_id,
-                        "topics": list(group.topics),
-                        "consumers": list(group.consumers),
-                        "offsets": group.offsets
-                    }
-                    for group in self.consumer_groups.values()
-                ]
-            }
+            if self._consumer_groups_payload is None:
+                self._consumer_groups_payload = orjson.dumps({
+                    "consumer_groups": [
+                        {
+                            "group_id": group.group_id,
+                            "topics": list(group.topics),
+                            "consumers": list(group.consumers),
+                            "offsets": group.offsets
+                        }
+                        for group in self.consumer_groups.values()
+                    ]
+                })
+            return Response(self._consumer_groups_payload, media_type="application/json")
         
         @self.app.post("/consumer-groups/{group_id}/subscribe")
         async def subscribe_group(
@@ -235,6 +292,7 @@ class MockKafkaServer:
             """Subscribe consumer group to topics."""
             if group_id not in self.consumer_groups:
                 self.consumer_groups[group_id] = MockConsumerGroup(group_id)
+                self._root_response = None
             
             group = self.consumer_groups[group_id]
             group.topics.update(topics)
@@ -243,36 +301,49 @@ class MockKafkaServer:
             for topic in topics:
                 if topic not in group.offsets:
                     group.offsets[topic] = 0
+            self._consumer_groups_payload = None
             
             return {"message": f"Consumer group '{group_id}' subscribed to topics"}
     
     def create_topic(self, name: str, partitions: int = 1):
         """Create a new topic."""
         self.topics[name] = MockTopic(name=name, partitions=partitions)
-        self.subscribers[name] = []
+        self.subscribers[name] = {}
+        self._topics_payload = None
+        self._root_response = None
         self.logger.info(f"Created topic '{name}' with {partitions} partitions")
     
-    def produce(self, topic: str, key: Optional[str], value: bytes, headers: Optional[Dict[str, str]] = None) -> int:
+    def produce(
+        self,
+        topic: str,
+        key: Optional[str],
+        value: Union[str, bytes],
+        headers: Optional[Dict[str, str]] = None
+    ) -> int:
         """Produce a message to a topic."""
         if topic not in self.topics:
             raise ValueError(f"Topic '{topic}' not found")
         
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        
         topic_obj = self.topics[topic]
         message = MockMessage(
             topic=topic,
-            partition=0,  # Simple partition assignment
+            partition=topic_obj.assign_partition(key),
             offset=topic_obj.next_offset,
             key=key,
             value=value,
             timestamp=int(time.time() * 1000),
-            headers=headers or {}
+            headers=headers or _EMPTY_HEADERS
         )
         
         topic_obj.messages.append(message)
         topic_obj.next_offset += 1
+        self._topics_payload = None
         
         # Notify subscribers
-        for callback in self.subscribers.get(topic, []):
+        for callback in self.subscribers.get(topic, {}).values():
             try:
                 callback(message)
             except Exception as e:
@@ -289,6 +360,8 @@ class MockKafkaServer:
         # Get or create consumer group
         if group_id not in self.consumer_groups:
             self.consumer_groups[group_id] = MockConsumerGroup(group_id)
+            self._consumer_groups_payload = None
+            self._root_response = None
         
         group = self.consumer_groups[group_id]
         topic_obj = self.topics[topic]
@@ -298,53 +371,65 @@ class MockKafkaServer:
         if offset is not None:
             current_offset = offset
         
-        # Get messages
-        messages = []
-        for msg in topic_obj.messages[current_offset:current_offset + limit]:
-            messages.append(msg)
+        # Get messages (offsets older than retention resume from the oldest message)
+        start = max(current_offset - topic_obj.base_offset, 0)
+        messages = list(itertools.islice(topic_obj.messages, start, start + limit))
         
         # Update offset
         if messages:
-            group.offsets[topic] = current_offset + len(messages)
+            group.offsets[topic] = messages[-1].offset + 1
+            self._consumer_groups_payload = None
         
         return messages
     
-    def subscribe(self, topic: str, callback: Callable[[MockMessage], None]):
-        """Subscribe to a topic."""
-        if topic not in self.subscribers:
-            self.subscribers[topic] = []
+    def subscribe(
+        self,
+        topic: str,
+        callback: Callable[[MockMessage], None],
+        subscriber_id: Optional[str] = None
+    ) -> str:
+        """Subscribe to a topic and return the subscriber ID."""
+        if subscriber_id is None:
+            subscriber_id = str(uuid.uuid4())
         
-        self.subscribers[topic].append(callback)
+        self.subscribers.setdefault(topic, {})[subscriber_id] = callback
         self.logger.debug(f"Subscribed to topic '{topic}'")
+        return subscriber_id
     
-    def unsubscribe(self, topic: str, callback_id: str):
+    def unsubscribe(self, topic: str, subscriber_id: str):
         """Unsubscribe from a topic."""
-        if topic in self.subscribers:
-            # Remove callback by ID (simplified)
-            self.subscribers[topic] = [
-                cb for cb in self.subscribers[topic] 
-                if str(id(cb)) != callback_id
-            ]
+        if self.subscribers.get(topic, {}).pop(subscriber_id, None) is not None:
             self.logger.debug(f"Unsubscribed from topic '{topic}'")
     
-    async def _send_to_websocket(self, connection_id: str, message: MockMessage):
-        """Send message to WebSocket connection."""
-        if connection_id in self.websocket_connections:
-            websocket = self.websocket_connections[connection_id]
+    def _enqueue_message(self, queue: asyncio.Queue, message: MockMessage):
+        """Queue a message for a WebSocket connection, dropping it if the client lags."""
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.logger.warning(f"WebSocket queue full, dropping message at offset {message.offset}")
+    
+    async def _pump_websocket(self, connection_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """Drain a connection's queue, sending each batch as one JSON array frame."""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < WEBSOCKET_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+            
             try:
-                message_data = {
-                    "topic": message.topic,
-                    "partition": message.partition,
-                    "offset": message.offset,
-                    "key": message.key,
-                    "value": message.value.decode('utf-8'),
-                    "timestamp": message.timestamp,
-                    "headers": message.headers
-                }
-                await websocket.send_text(json.dumps(message_data))
+                await websocket.send_bytes(orjson.dumps([
+                    {
+                        "topic": message.topic,
+                        "partition": message.partition,
+                        "offset": message.offset,
+                        "key": message.key,
+                        "value": message.value,
+                        "timestamp": message.timestamp,
+                        "headers": message.headers or {}
+                    }
+                    for message in batch
+                ]))
             except Exception as e:
-                self.logger.error(f"Error sending to WebSocket: {e}")
-
+                self.logger.error(f"Error sending to WebSocket {connection_id}: {e}")
 
 def create_app():
     """Create mock Kafka application."""
@@ -354,4 +439,14 @@ def create_app():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(create_app(), host="0.0.0.0", port=9092)
+    # Each worker holds its own in-memory topics; keep WORKERS=1 when producing
+    # and consuming through the same mock.
+    uvicorn.run(
+        "mocks.kafka.server:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=9092,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
@@ -0,0 +1,85 @@
+"""
+Token minting helpers for the mock Keycloak server.
+
+Kept free of FastAPI and fully annotated so the module can be compiled with
+mypyc (``mypyc mocks/keycloak/minting.py``); the server imports the compiled
+extension when it is present and this source otherwise.
+"""
+
+from typing import Any, Dict
+
+import jwt
+
+# Token lifetimes in seconds
+ACCESS_TTL = 3600
+REFRESH_TTL = 2592000  # 30 days
+
+SCOPE = "openid profile email"
+
+
+def access_token_payload(
+    skeleton: Dict[str, Any],
+    user_id: str,
+    user_data: Dict[str, Any],
+    client_id: str,
+    now_ts: int
+) -> Dict[str, Any]:
+    """Build a user access token payload from the static claim skeleton."""
+    roles = user_data["roles"]
+    payload = skeleton.copy()
+    payload["sub"] = user_id
+    payload["iat"] = now_ts
+    payload["exp"] = now_ts + ACCESS_TTL
+    payload["preferred_username"] = user_data["preferred_username"]
+    payload["email"] = user_data["email"]
+    payload["tenant_id"] = user_data["tenant_id"]
+    payload["realm_access"] = {"roles": roles}
+    payload["resource_access"] = {client_id: {"roles": roles}}
+    return payload
+
+
+def refresh_token_payload(skeleton: Dict[str, Any], user_id: str, now_ts: int) -> Dict[str, Any]:
+    """Build a refresh token payload from the static claim skeleton."""
+    payload = skeleton.copy()
+    payload["sub"] = user_id
+    payload["iat"] = now_ts
+    payload["exp"] = now_ts + REFRESH_TTL
+    return payload
+
+
+def service_account_payload(skeleton: Dict[str, Any], now_ts: int) -> Dict[str, Any]:
+    """Build a service-account access token payload from its skeleton."""
+    payload = skeleton.copy()
+    payload["iat"] = now_ts
+    payload["exp"] = now_ts + ACCESS_TTL
+    return payload
+
+
+def sign_token(payload: Dict[str, Any], private_key: Any, algorithm: str, key_id: str) -> str:
+    """Sign a payload, tagging the header with the signing key id."""
+    return jwt.encode(payload, private_key, algorithm=algorithm, headers={"kid": key_id})
+
+
+def token_pair_response(access_token: str, refresh_token: str) -> Dict[str, Any]:
+    """Build the token endpoint response for an access/refresh pair."""
+    return {
+        "access_token": access_token,
+        "expires_in": ACCESS_TTL,
+        "refresh_expires_in": REFRESH_TTL,
+        "refresh_token": refresh_token,
+        "token_type": "Bearer",
+        "not-before-policy": 0,
+        "scope": SCOPE
+    }
+
+
+def service_token_response(access_token: str) -> Dict[str, Any]:
+    """Build the token endpoint response for a service-account token."""
+    return {
+        "access_token": access_token,
+        "expires_in": ACCESS_TTL,
+        "refresh_expires_in": 0,
+        "token_type": "Bearer",
+        "not-before-policy": 0,
+        "scope": SCOPE
+    }
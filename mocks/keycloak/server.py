@@ -2,12 +2,20 @@
 Mock Keycloak server providing JWKS and token validation endpoints.
 """
 
+import base64
+import hashlib
+import hmac
 import json
 import time
 import jwt
+import orjson
+from cachetools import LRUCache, TTLCache
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 import sys
@@ -17,15 +25,60 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from shared.logging import get_logger
+from mocks.keycloak.minting import (
+    access_token_payload,
+    refresh_token_payload,
+    service_account_payload,
+    service_token_response,
+    sign_token,
+    token_pair_response,
+)
+
+# Client-side caching for the discovery document and JWKS. The signing key is
+# regenerated on restart unless seeded, so the JWKS is not cached for longer.
+DISCOVERY_CACHE_HEADERS = {"Cache-Control": "public, max-age=3600"}
+JWKS_CACHE_HEADERS = {"Cache-Control": "public, max-age=3600"}
+
+# Hex-encoded 32-byte Ed25519 seed shared by all workers of one server
+SIGNING_SEED_ENV = "MOCK_KEYCLOAK_SIGNING_SEED"
+
+# Decoded (unverified) token payloads keyed by a short token digest
+_decode_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
+
+
+async def _cached_decode(token: str) -> Dict[str, Any]:
+    """Decode a token without verifying its signature, caching the payload.
+    
+    The cache is only touched from the event loop; misses are decoded in the
+    threadpool. Raises jwt.InvalidTokenError for malformed tokens (failures
+    are not cached).
+    """
+    # Non-cryptographic use: the digest only needs to be a collision-resistant key
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _decode_cache.get(key)
+    if payload is None:
+        payload = await run_in_threadpool(
+            jwt.decode, token, options={"verify_signature": False}
+        )
+        _decode_cache[key] = payload
+    return payload
 
 
 class MockKeycloakServer:
     """Mock Keycloak server implementation."""
     
-    def __init__(self, port: int = 8080):
+    def __init__(self, port: int = 8080, mint_cache_window: int = 1):
         self.port = port
+        # Mints for the same user within one window (seconds) reuse the signed
+        # pair; 0 disables the cache
+        self.mint_cache_window = mint_cache_window
+        self._mint_cache: LRUCache = LRUCache(maxsize=1024)
         self.logger = get_logger("mock.keycloak")
-        self.app = FastAPI(title="Mock Keycloak", version="1.0.0")
+        self.app = FastAPI(
+            title="Mock Keycloak",
+            version="1.0.0",
+            default_response_class=ORJSONResponse
+        )
         
         # Mock configuration
         self.realm = "254carbon"
@@ -57,22 +110,109 @@ class MockKeycloakServer:
             }
         }
         
+        # Ed25519 signing key (kept as a key object so PyJWT does not re-parse
+        # a PEM per mint). Workers share a seed so they publish the same JWKS;
+        # without one the key is ephemeral.
+        seed = os.getenv(SIGNING_SEED_ENV)
+        if seed:
+            self.private_key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(seed))
+        else:
+            self.private_key = Ed25519PrivateKey.generate()
+        public_key = self.private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
+        )
+        self.signing_algorithm = "EdDSA"
+        self.key_id = "mock-key-1"
+        
+        # Userinfo responses with sensitive fields removed, built once
+        self._userinfo_view = {
+            user_id: {k: v for k, v in user_data.items() if k != "sub"}
+            for user_id, user_data in self.users.items()
+        }
+        
+        # Shared bearer-token security scheme
+        self._bearer = HTTPBearer()
+        
+        # Mock credentials: username -> (password, user_id)
+        self._creds = {
+            "john.doe": ("password123", "user1"),
+            "jane.smith": ("password123", "user2"),
+            "admin": ("admin123", "admin")
+        }
+        
         # Mock JWKS
         self.jwks = {
             "keys": [
                 {
-                    "kty": "RSA",
-                    "kid": "mock-key-1",
+                    "kty": "OKP",
+                    "crv": "Ed25519",
+                    "kid": self.key_id,
                     "use": "sig",
-                    "n": "mock-public-key-n",
-                    "e": "AQAB",
-                    "alg": "RS256"
+                    "x": base64.urlsafe_b64encode(public_key).rstrip(b"=").decode("ascii"),
+                    "alg": self.signing_algorithm
                 }
             ]
         }
         
-        # Mock private key for signing (in real implementation, this would be secure)
-        self.private_key = "mock-private-key"
+        # Claims shared by every minted token; per-token fields are merged in
+        self._access_skeleton = {
+            "iss": self.issuer,
+            "aud": self.client_id,
+            "azp": self.client_id,
+            "scope": "openid profile email"
+        }
+        self._refresh_skeleton = {
+            "iss": self.issuer,
+            "aud": self.client_id,
+            "azp": self.client_id,
+            "typ": "Refresh"
+        }
+        # Service-account token claims only vary by iat/exp
+        self._cc_skeleton = self._access_skeleton.copy()
+        self._cc_skeleton.update(
+            sub="service-account",
+            realm_access={"roles": ["service-account"]},
+            resource_access={self.client_id: {"roles": ["service-account"]}}
+        )
+        # Last service-account response and the mint window it belongs to
+        self._cc_cache_window: Optional[int] = None
+        self._cc_cache_resp: Optional[Dict[str, Any]] = None
+        
+        # Static documents (the mock user set never changes) are serialized once
+        self._root_body = orjson.dumps({
+            "service": "mock-keycloak",
+            "message": "Mock Keycloak server for 254Carbon Access Layer",
+            "version": "1.0.0",
+            "realm": self.realm,
+            "issuer": self.issuer
+        })
+        self._openid_config_body = orjson.dumps({
+            "issuer": self.issuer,
+            "authorization_endpoint": f"{self.issuer}/protocol/openid-connect/auth",
+            "token_endpoint": f"{self.issuer}/protocol/openid-connect/token",
+            "userinfo_endpoint": f"{self.issuer}/protocol/openid-connect/userinfo",
+            "jwks_uri": f"{self.issuer}/protocol/openid-connect/certs",
+            "end_session_endpoint": f"{self.issuer}/protocol/openid-connect/logout",
+            "grant_types_supported": ["authorization_code", "client_credentials", "refresh_token"],
+            "response_types_supported": ["code"],
+            "subject_types_supported": ["public"],
+            "id_token_signing_alg_values_supported": [self.signing_algorithm],
+            "scopes_supported": ["openid", "profile", "email"]
+        })
+        self._jwks_body = orjson.dumps(self.jwks)
+        self._users_list_body = orjson.dumps({
+            "users": [
+                {
+                    "id": user_id,
+                    "username": user_data["preferred_username"],
+                    "email": user_data["email"],
+                    "tenant_id": user_data["tenant_id"],
+                    "roles": user_data["roles"]
+                }
+                for user_id, user_data in self.users.items()
+            ]
+        })
         
         self._setup_routes()
     
@@ -82,45 +222,30 @@ class MockKeycloakServer:
         @self.app.get("/")
         async def root():
             """Root endpoint."""
-            return {
-                "service": "mock-keycloak",
-                "message": "Mock Keycloak server for 254Carbon Access Layer",
-                "version": "1.0.0",
-                "realm": self.realm,
-                "issuer": self.issuer
-            }
+            return Response(self._root_body, media_type="application/json")
+        
+        # Only the configured realm is routed; other realms fall through to
+        # the catch-all below instead of being checked in every handler
+        router = APIRouter(prefix=f"/realms/{self.realm}")
         
-        @self.app.get("/realms/{realm}/.well-known/openid_configuration")
-        async def openid_configuration(realm: str):
+        @router.get("/.well-known/openid_configuration")
+        async def openid_configuration():
             """OpenID Connect configuration."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
-            return {
-                "issuer": self.issuer,
-                "authorization_endpoint": f"{self.issuer}/protocol/openid-connect/auth",
-                "token_endpoint": f"{self.issuer}/protocol/openid-connect/token",
-                "userinfo_endpoint": f"{self.issuer}/protocol/openid-connect/userinfo",
-                "jwks_uri": f"{self.issuer}/protocol/openid-connect/certs",
-                "end_session_endpoint": f"{self.issuer}/protocol/openid-connect/logout",
-                "grant_types_supported": ["authorization_code", "client_credentials", "refresh_token"],
-                "response_types_supported": ["code"],
-                "subject_types_supported": ["public"],
-                "id_token_signing_alg_values_supported": ["RS256"],
-                "scopes_supported": ["openid", "profile", "email"]
-            }
+            return Response(
+                self._openid_config_body,
+                media_type="application/json",
+                headers=DISCOVERY_CACHE_HEADERS
+            )
         
-        @self.app.get("/realms/{realm}/protocol/openid-connect/certs")
-        async def jwks_endpoint(realm: str):
+        @router.get("/protocol/openid-connect/certs")
+        async def jwks_endpoint():
             """JWKS endpoint."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
-            return self.jwks
+            return Response(
+                self._jwks_body, media_type="application/json", headers=JWKS_CACHE_HEADERS
+            )
         
-        @self.app.post("/realms/{realm}/protocol/openid-connect/token")
+        @router.post("/protocol/openid-connect/token")
         async def token_endpoint(
-            realm: str,
             grant_type: str = Query(...),
             client_id: str = Query(...),
             username: Optional[str] = Query(None),
@@ -128,9 +253,6 @@ class MockKeycloakServer:
             refresh_token: Optional[str] = Query(None)
         ):
             """Token endpoint for authentication."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
             if client_id != self.client_id:
                 raise HTTPException(status_code=400, detail="Invalid client")
             
@@ -143,72 +265,55 @@ class MockKeycloakServer:
             else:
                 raise HTTPException(status_code=400, detail="Unsupported grant type")
         
-        @self.app.get("/realms/{realm}/protocol/openid-connect/userinfo")
+        @router.get("/protocol/openid-connect/userinfo")
         async def userinfo_endpoint(
-            realm: str,
-            credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            credentials: HTTPAuthorizationCredentials = Depends(self._bearer)
         ):
             """User info endpoint."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
             try:
                 # Decode token to get user info
                 token = credentials.credentials
-                payload = jwt.decode(token, options={"verify_signature": False})
+                payload = await _cached_decode(token)
                 
-                user_id = payload.get("sub")
-                if user_id not in self.users:
+                user_info = self._userinfo_view.get(payload.get("sub"))
+                if user_info is None:
                     raise HTTPException(status_code=401, detail="Invalid user")
                 
-                user_info = self.users[user_id].copy()
-                # Remove sensitive fields
-                user_info.pop("sub", None)
-                
                 return user_info
                 
             except jwt.InvalidTokenError:
                 raise HTTPException(status_code=401, detail="Invalid token")
         
-        @self.app.post("/realms/{realm}/protocol/openid-connect/logout")
-        async def logout_endpoint(realm: str):
+        @router.post("/protocol/openid-connect/logout")
+        async def logout_endpoint():
             """Logout endpoint."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
             return {"message": "Logged out successfully"}
         
-        @self.app.get("/realms/{realm}/users")
-        async def list_users(realm: str):
+        @router.get("/users")
+        async def list_users():
             """List users endpoint."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
-            return {
-                "users": [
-                    {
-                        "id": user_id,
-                        "username": user_data["preferred_username"],
-                        "email": user_data["email"],
-                        "tenant_id": user_data["tenant_id"],
-                        "roles": user_data["roles"]
-                    }
-                    for user_id, user_data in self.users.items()
-                ]
-            }
+            return Response(self._users_list_body, media_type="application/json")
         
-        @self.app.get("/realms/{realm}/users/{user_id}")
-        async def get_user(realm: str, user_id: str):
+        @router.get("/users/{user_id}")
+        async def get_user(user_id: str):
             """Get user by ID."""
-            if realm != self.realm:
-                raise HTTPException(status_code=404, detail="Realm not found")
-            
             if user_id not in self.users:
                 raise HTTPException(status_code=404, detail="User not found")
             
             user_data = self.users[user_id].copy()
             user_data["id"] = user_id
             return user_data
+        
+        self.app.include_router(router)
+        
+        @self.app.api_route(
+            "/realms/{realm}/{path:path}", methods=["GET", "POST"], include_in_schema=False
+        )
+        async def unknown_realm(realm: str, path: str):
+            """Reject requests for realms other than the configured one."""
+            if realm != self.realm:
+                raise HTTPException(status_code=404, detail="Realm not found")
+            raise HTTPException(status_code=404, detail="Not Found")
     
     async def _handle_password_grant(self, username: Optional[str], password: Optional[str]) -> Dict[str, Any]:
         """Handle password grant type."""
@@ -216,16 +321,11 @@ class MockKeycloakServer:
             raise HTTPException(status_code=400, detail="Username and password required")
         
         # Simple mock authentication
-        if username == "john.doe" and password == "password123":
-            user_id = "user1"
-        elif username == "jane.smith" and password == "password123":
-            user_id = "user2"
-        elif username == "admin" and password == "admin123":
-            user_id = "admin"
-        else:
+        entry = self._creds.get(username)
+        if entry is None or not hmac.compare_digest(entry[0].encode(), password.encode()):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        return await self._generate_token_pair(user_id)
+        return await self._generate_token_pair(entry[1])
     
     async def _handle_refresh_token(self, refresh_token: Optional[str]) -> Dict[str, Any]:
         """Handle refresh token grant type."""
@@ -234,100 +334,71 @@ class MockKeycloakServer:
         
         try:
             # Decode refresh token to get user info
-            payload = jwt.decode(refresh_token, options={"verify_signature": False})
+            payload = await _cached_decode(refresh_token)
             user_id = payload.get("sub")
             
-            if user_id not in self.users:
+            user_data = self.users.get(user_id)
+            if user_data is None:
                 raise HTTPException(status_code=401, detail="Invalid refresh token")
             
-            return await self._generate_token_pair(user_id)
+            return await self._generate_token_pair(user_id, user_data)
             
         except jwt.InvalidTokenError:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
     
     async def _handle_client_credentials(self) -> Dict[str, Any]:
         """Handle client credentials grant type."""
-        # Generate service account token
-        now = datetime.utcnow()
-        access_token_payload = {
-            "iss": self.issuer,
-            "sub": "service-account",
-            "aud": self.client_id,
-            "iat": int(now.timestamp()),
-            "exp": int((now + timedelta(hours=1)).timestamp()),
-            "azp": self.client_id,
-            "scope": "openid profile email",
-            "realm_access": {
-                "roles": ["service-account"]
-            },
-            "resource_access": {
-                self.client_id: {
-                    "roles": ["service-account"]
-                }
-            }
-        }
+        # Generate service account token; clients within one mint window share it
+        now_ts = int(time.time())
+        window = now_ts // self.mint_cache_window if self.mint_cache_window > 0 else None
+        if window is not None and window == self._cc_cache_window:
+            return self._cc_cache_resp
         
-        access_token = jwt.encode(access_token_payload, self.private_key, algorithm="HS256")
+        access_token = await run_in_threadpool(
+            sign_token, service_account_payload(self._cc_skeleton, now_ts),
+            self.private_key, self.signing_algorithm, self.key_id
+        )
         
-        return {
-            "access_token": access_token,
-            "expires_in": 3600,
-            "refresh_expires_in": 0,
-            "token_type": "Bearer",
-            "not-before-policy": 0,
-            "scope": "openid profile email"
-        }
+        response = service_token_response(access_token)
+        if window is not None:
+            self._cc_cache_window = window
+            self._cc_cache_resp = response
+        return response
     
-    async def _generate_token_pair(self, user_id: str) -> Dict[str, Any]:
-        """Generate access and refresh token pair."""
-        user_data = self.users[user_id]
-        now = datetime.utcnow()
+    async def _generate_token_pair(
+        self, user_id: str, user_data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Generate access and refresh token pair.
         
-        # Access token payload
-        access_token_payload = {
-            "iss": self.issuer,
-            "sub": user_id,
-            "aud": self.client_id,
-            "iat": int(now.timestamp()),
-            "exp": int((now + timedelta(hours=1)).timestamp()),
-            "azp": self.client_id,
-            "scope": "openid profile email",
-            "preferred_username": user_data["preferred_username"],
-            "email": user_data["email"],
-            "tenant_id": user_data["tenant_id"],
-            "realm_access": {
-                "roles": user_data["roles"]
-            },
-            "resource_access": {
-                self.client_id: {
-                    "roles": user_data["roles"]
-                }
-            }
-        }
+        Callers that already looked up the user pass user_data to skip a
+        second lookup.
+        """
+        if user_data is None:
+            user_data = self.users[user_id]
+        now_ts = int(time.time())
         
-        # Refresh token payload
-        refresh_token_payload = {
-            "iss": self.issuer,
-            "sub": user_id,
-            "aud": self.client_id,
-            "iat": int(now.timestamp()),
-            "exp": int((now + timedelta(days=30)).timestamp()),
-            "azp": self.client_id,
-            "typ": "Refresh"
-        }
+        cache_key = None
+        if self.mint_cache_window > 0:
+            cache_key = (user_id, now_ts // self.mint_cache_window)
+            cached = self._mint_cache.get(cache_key)
+            if cached is not None:
+                return token_pair_response(*cached)
         
-        access_token = jwt.encode(access_token_payload, self.private_key, algorithm="HS256")
-        refresh_token = jwt.encode(refresh_token_payload, self.private_key, algorithm="HS256")
+        access_payload = access_token_payload(
+            self._access_skeleton, user_id, user_data, self.client_id, now_ts
+        )
+        refresh_payload = refresh_token_payload(self._refresh_skeleton, user_id, now_ts)
         
-        return {
-            "access_token": access_token,
-            "expires_in": 3600,
-            "refresh_expires_in": 2592000,  # 30 days
-            "refresh_token": refresh_token,
-            "token_type": "Bearer",
-            "not-before-policy": 0,
-            "scope": "openid profile email"
-        }
+        access_token = await run_in_threadpool(
+            sign_token, access_payload, self.private_key, self.signing_algorithm, self.key_id
+        )
+        refresh_token = await run_in_threadpool(
+            sign_token, refresh_payload, self.private_key, self.signing_algorithm, self.key_id
+        )
+        
+        if cache_key is not None:
+            self._mint_cache[cache_key] = (access_token, refresh_token)
+        return token_pair_response(access_token, refresh_token)
 
 
 def create_app():
@@ -338,4 +409,14 @@ def create_app():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(create_app(), host="0.0.0.0", port=8080)
+    # Workers are separate processes; hand them one signing key via the environment
+    os.environ.setdefault(SIGNING_SEED_ENV, os.urandom(32).hex())
+    uvicorn.run(
+        "mocks.keycloak.server:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=8080,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", os.cpu_count() or 1))
+    )
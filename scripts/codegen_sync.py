@@ -7,16 +7,36 @@ This script pulls the latest API contracts from the specs repository.
 import os
 import sys
 import json
+import shlex
 import subprocess
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, Any
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Write buffer for generated OpenAPI specs
+SPEC_WRITE_BUFFER = 1 << 20
+
+# Default development ports per service
+_PORTS = MappingProxyType({
+    "gateway": "8000",
+    "streaming": "8001",
+    "auth": "8010",
+    "entitlements": "8011",
+    "metrics": "8012"
+})
+
 def run_command(cmd: str, cwd: str = None) -> tuple[int, str, str]:
     """Run a command and return exit code, stdout, stderr."""
     try:
         result = subprocess.run(
-            cmd.split(),
+            shlex.split(cmd),
             cwd=cwd,
             capture_output=True,
             text=True,
@@ -33,6 +53,8 @@ def load_specs_lock() -> Dict[str, Any]:
         return {}
     
     try:
+        if orjson is not None:
+            return orjson.loads(lock_file.read_bytes())
         with open(lock_file, 'r') as f:
             return json.load(f)
     except Exception as e:
@@ -107,8 +129,11 @@ def sync_openapi_specs(service: str, contract_version: str) -> bool:
     spec_file = openapi_dir / f"{service}-api.yaml"
     try:
         import yaml
-        with open(spec_file, 'w') as f:
-            yaml.dump(openapi_spec, f, default_flow_style=False)
+        # Prefer the libyaml-backed dumper; it is absent when PyYAML was built without it
+        dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        # Emit UTF-8 bytes through a 1 MiB buffer so large specs flush in few writes
+        with open(spec_file, 'wb', buffering=SPEC_WRITE_BUFFER) as f:
+            yaml.dump(openapi_spec, f, Dumper=dumper, default_flow_style=False, encoding='utf-8')
         print(f"Updated OpenAPI spec for {service}: {spec_file}")
         return True
     except ImportError:
@@ -117,14 +142,7 @@ def sync_openapi_specs(service: str, contract_version: str) -> bool:
 
 def get_service_port(service: str) -> str:
     """Get the default port for a service."""
-    ports = {
-        "gateway": "8000",
-        "streaming": "8001",
-        "auth": "8010",
-        "entitlements": "8011",
-        "metrics": "8012"
-    }
-    return ports.get(service, "8000")
+    return _PORTS.get(service, "8000")
 
 def main():
     """Main function to sync code generation."""
@@ -145,12 +163,13 @@ def main():
     # Update specs lock
     update_specs_lock(services)
     
-    # Sync OpenAPI specs for each service
-    success_count = 0
-    for service, contract in services.items():
-        contract_version = contract.split('@')[1]
-        if sync_openapi_specs(service, contract_version):
-            success_count += 1
+    # Sync OpenAPI specs for all services concurrently (each is independent file I/O)
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        results = list(executor.map(
+            lambda item: sync_openapi_specs(item[0], item[1].split('@')[1]),
+            services.items()
+        ))
+    success_count = sum(results)
     
     print(f"Successfully synced {success_count}/{len(services)} services")
     
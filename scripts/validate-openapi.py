@@ -5,20 +5,39 @@ This script validates OpenAPI specifications for all services.
 """
 
 import os
+import re
 import sys
 import yaml
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 from jsonschema import validate, ValidationError
 import logging
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# Prefer the libyaml-backed loader; it is absent when PyYAML was built without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_REQUIRED_TOP = frozenset({"openapi", "info", "paths"})
+_REQUIRED_INFO = frozenset({"title", "version"})
+
+_VALID_METHODS = frozenset({"get", "post", "put", "delete", "patch", "head", "options", "trace"})
+_BODY_METHODS = frozenset({"post", "put", "patch"})
+_DOC_METHODS = frozenset({"get", "post", "put", "delete", "patch"})
+
+_SEMVER_RE = re.compile(r'^\d+\.\d+\.\d+(-[a-zA-Z0-9.-]+)?(\+[a-zA-Z0-9.-]+)?$')
+
 class OpenAPIValidator:
     """OpenAPI specification validator."""
     
@@ -27,6 +46,19 @@ class OpenAPIValidator:
         self.services = ["gateway", "streaming", "auth", "entitlements", "metrics"]
         self.errors = []
         self.warnings = []
+        # Parsed specs, shared by validation, consistency checks and docs generation
+        self._spec_cache: Dict[Path, Dict[str, Any]] = {}
+        # info.version per service, recorded while validating each spec
+        self._versions: Dict[str, str] = {}
+    
+    def _load_spec(self, spec_path: Path) -> Dict[str, Any]:
+        """Load and parse an OpenAPI specification, reusing earlier parses."""
+        spec = self._spec_cache.get(spec_path)
+        if spec is None:
+            with open(spec_path, 'rb') as f:
+                spec = yaml.load(f, Loader=YAML_LOADER)
+            self._spec_cache[spec_path] = spec
+        return spec
     
     def validate_spec_file(self, spec_path: Path) -> bool:
         """
@@ -39,8 +71,7 @@ class OpenAPIValidator:
             True if valid, False otherwise
         """
         try:
-            with open(spec_path, 'r') as f:
-                spec = yaml.safe_load(f)
+            spec = self._load_spec(spec_path)
             
             # Basic structure validation
             if not self._validate_basic_structure(spec, spec_path):
@@ -53,6 +84,8 @@ class OpenAPIValidator:
             # Info section validation
             if not self._validate_info_section(spec, spec_path):
                 return False
+            service = spec_path.parent.parent.name.removeprefix("service_")
+            self._versions[service] = spec["info"]["version"]
             
             # Paths validation
             if not self._validate_paths(spec, spec_path):
@@ -76,12 +109,12 @@ class OpenAPIValidator:
     
     def _validate_basic_structure(self, spec: Dict[str, Any], spec_path: Path) -> bool:
         """Validate basic OpenAPI structure."""
-        required_fields = ["openapi", "info", "paths"]
-        
-        for field in required_fields:
-            if field not in spec:
-                self.errors.append(f"{spec_path.name}: Missing required field '{field}'")
-                return False
+        missing = _REQUIRED_TOP - spec.keys()
+        if missing:
+            self.errors.extend(
+                f"{spec_path.name}: Missing required field '{field}'" for field in sorted(missing)
+            )
+            return False
         
         return True
     
@@ -98,12 +131,11 @@ class OpenAPIValidator:
     def _validate_info_section(self, spec: Dict[str, Any], spec_path: Path) -> bool:
         """Validate info section."""
         info = spec.get("info", {})
-        required_info_fields = ["title", "version"]
         
-        for field in required_info_fields:
-            if field not in info:
-                self.errors.append(f"{spec_path.name}: Missing info.{field}")
-                return False
+        missing = _REQUIRED_INFO - info.keys()
+        if missing:
+            self.errors.extend(f"{spec_path.name}: Missing info.{field}" for field in sorted(missing))
+            return False
         
         # Validate version format (semantic versioning)
         version = info.get("version", "")
@@ -134,37 +166,37 @@ class OpenAPIValidator:
             return False
         
         # Validate HTTP methods
-        valid_methods = ["get", "post", "put", "delete", "patch", "head", "options", "trace"]
-        
         for method, operation in path_item.items():
-            if method.lower() in valid_methods:
+            method = method.lower()
+            if method in _VALID_METHODS:
                 if not self._validate_operation(method, operation, spec_path):
                     return False
         
         return True
     
     def _validate_operation(self, method: str, operation: Dict[str, Any], spec_path: Path) -> bool:
-        """Validate a single operation."""
+        """Validate a single operation; method is expected in lower case."""
+        method_upper = method.upper()
         # Check for required fields
         if "responses" not in operation:
-            self.errors.append(f"{spec_path.name}: Operation {method.upper()} missing 'responses'")
+            self.errors.append(f"{spec_path.name}: Operation {method_upper} missing 'responses'")
             return False
         
         # Validate responses
         responses = operation.get("responses", {})
         if not responses:
-            self.errors.append(f"{spec_path.name}: Operation {method.upper()} has no responses")
+            self.errors.append(f"{spec_path.name}: Operation {method_upper} has no responses")
             return False
         
         # Check for at least one successful response
         success_responses = [code for code in responses.keys() if code.startswith("2")]
         if not success_responses:
-            self.warnings.append(f"{spec_path.name}: Operation {method.upper()} has no 2xx responses")
+            self.warnings.append(f"{spec_path.name}: Operation {method_upper} has no 2xx responses")
         
         # Validate request body for POST/PUT/PATCH
-        if method.lower() in ["post", "put", "patch"]:
+        if method in _BODY_METHODS:
             if "requestBody" not in operation:
-                self.warnings.append(f"{spec_path.name}: Operation {method.upper()} missing 'requestBody'")
+                self.warnings.append(f"{spec_path.name}: Operation {method_upper} missing 'requestBody'")
         
         return True
     
@@ -214,9 +246,20 @@ class OpenAPIValidator:
     
     def _is_semantic_version(self, version: str) -> bool:
         """Check if version follows semantic versioning."""
-        import re
-        pattern = r'^\d+\.\d+\.\d+(-[a-zA-Z0-9.-]+)?(\+[a-zA-Z0-9.-]+)?$'
-        return bool(re.match(pattern, version))
+        return _SEMVER_RE.match(version) is not None
+    
+    def _validate_spec_isolated(self, spec_path: Path) -> Tuple[bool, List[str], List[str]]:
+        """
+        Validate a spec into its own error/warning lists so it can run in a worker thread.
+        
+        Returns:
+            Tuple of (valid, errors, warnings)
+        """
+        worker = OpenAPIValidator(str(self.base_path))
+        worker._spec_cache = self._spec_cache
+        worker._versions = self._versions
+        valid = worker.validate_spec_file(spec_path)
+        return valid, worker.errors, worker.warnings
     
     def validate_all_specs(self) -> bool:
         """Validate all OpenAPI specifications."""
@@ -224,6 +267,7 @@ class OpenAPIValidator:
         
         all_valid = True
         
+        spec_paths = []
         for service in self.services:
             spec_path = self.base_path / f"service_{service}" / "openapi" / f"{service}-api.yaml"
             
@@ -232,28 +276,37 @@ class OpenAPIValidator:
                 all_valid = False
                 continue
             
-            if not self.validate_spec_file(spec_path):
+            spec_paths.append(spec_path)
+        
+        if not spec_paths:
+            return all_valid
+        
+        # Specs are independent; validate them concurrently and merge in service order
+        with ThreadPoolExecutor(max_workers=len(spec_paths)) as executor:
+            results = list(executor.map(self._validate_spec_isolated, spec_paths))
+        
+        for valid, errors, warnings in results:
+            self.errors.extend(errors)
+            self.warnings.extend(warnings)
+            if not valid:
                 all_valid = False
         
         return all_valid
     
     def validate_consistency(self) -> bool:
-        """Validate consistency across all specifications."""
+        """Validate consistency across all specifications.
+        
+        Uses the versions recorded by validate_all_specs/validate_spec_file
+        instead of re-reading the specs.
+        """
         logger.info("Validating consistency across specifications...")
         
         # Check version consistency
-        versions = {}
-        for service in self.services:
-            spec_path = self.base_path / f"service_{service}" / "openapi" / f"{service}-api.yaml"
-            
-            if spec_path.exists():
-                try:
-                    with open(spec_path, 'r') as f:
-                        spec = yaml.safe_load(f)
-                    versions[service] = spec.get("info", {}).get("version", "unknown")
-                except Exception as e:
-                    self.errors.append(f"Error reading {spec_path}: {e}")
-                    return False
+        versions = {
+            service: self._versions[service]
+            for service in self.services
+            if service in self._versions
+        }
         
         # Check if all services use the same version
         unique_versions = set(versions.values())
@@ -269,36 +322,55 @@ class OpenAPIValidator:
         output_path = Path(output_dir)
         output_path.mkdir(exist_ok=True)
         
-        for service in self.services:
-            spec_path = self.base_path / f"service_{service}" / "openapi" / f"{service}-api.yaml"
+        services = [
+            service for service in self.services
+            if (self.base_path / f"service_{service}" / "openapi" / f"{service}-api.yaml").exists()
+        ]
+        if not services:
+            return True
+        
+        # Each service writes its own files; generate concurrently and merge errors in order
+        with ThreadPoolExecutor(max_workers=len(services)) as executor:
+            results = list(executor.map(
+                lambda service: self._generate_service_documentation(service, output_path),
+                services
+            ))
+        
+        errors = [error for error in results if error is not None]
+        self.errors.extend(errors)
+        return not errors
+    
+    def _generate_service_documentation(self, service: str, output_path: Path) -> Optional[str]:
+        """Generate HTML and JSON documentation for one service; returns an error message on failure."""
+        spec_path = self.base_path / f"service_{service}" / "openapi" / f"{service}-api.yaml"
+        
+        try:
+            spec = self._load_spec(spec_path)
             
-            if not spec_path.exists():
-                continue
+            # Generate HTML documentation
+            html_path = output_path / f"{service}-api.html"
+            self._generate_html_docs(spec, html_path)
             
-            try:
-                with open(spec_path, 'r') as f:
-                    spec = yaml.safe_load(f)
-                
-                # Generate HTML documentation
-                html_path = output_path / f"{service}-api.html"
-                self._generate_html_docs(spec, html_path)
-                
-                # Generate JSON specification
-                json_path = output_path / f"{service}-api.json"
+            # Generate JSON specification
+            json_path = output_path / f"{service}-api.json"
+            if orjson is not None:
+                # YAML may produce integer keys (e.g. unquoted response codes)
+                json_path.write_bytes(
+                    orjson.dumps(spec, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+                )
+            else:
                 with open(json_path, 'w') as f:
                     json.dump(spec, f, indent=2)
-                
-                logger.info(f"Generated documentation for {service}")
-                
-            except Exception as e:
-                self.errors.append(f"Error generating documentation for {service}: {e}")
-                return False
-        
-        return True
+            
+            logger.info(f"Generated documentation for {service}")
+            return None
+            
+        except Exception as e:
+            return f"Error generating documentation for {service}: {e}"
     
     def _generate_html_docs(self, spec: Dict[str, Any], output_path: Path) -> None:
         """Generate HTML documentation from OpenAPI spec."""
-        html_content = f"""
+        parts = [f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -320,28 +392,28 @@ class OpenAPIValidator:
     </div>
     
     <h2>Endpoints</h2>
-"""
+"""]
         
         paths = spec.get("paths", {})
         for path, path_item in paths.items():
             for method, operation in path_item.items():
-                if method.lower() in ["get", "post", "put", "delete", "patch"]:
-                    html_content += f"""
+                if method.lower() in _DOC_METHODS:
+                    parts.append(f"""
     <div class="endpoint">
         <div class="method">{method.upper()}</div>
         <div class="path">{path}</div>
         <div class="description">{operation.get('summary', '')}</div>
         <p>{operation.get('description', '')}</p>
     </div>
-"""
+""")
         
-        html_content += """
+        parts.append("""
 </body>
 </html>
-"""
+""")
         
         with open(output_path, 'w') as f:
-            f.write(html_content)
+            f.write("".join(parts))
     
     def print_results(self) -> None:
         """Print validation results."""
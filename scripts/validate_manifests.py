@@ -7,16 +7,134 @@ This script validates all service-manifest.yaml files for correctness.
 import os
 import sys
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
+
+# Prefer the libyaml-backed loader; it is absent when PyYAML was built without it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_REQUIRED_MANIFEST = frozenset({
+    'service_name', 'domain', 'runtime', 'language_version',
+    'api_contracts', 'dependencies', 'maturity', 'sla', 'owner'
+})
+
+# Top-level keys validate_manifest inspects; everything else is never constructed
+_VALIDATED_KEYS = _REQUIRED_MANIFEST | {'performance'}
+
+_MERGE_TAG = 'tag:yaml.org,2002:merge'
+
+def _load_manifest(stream) -> Any:
+    """Load only the top-level manifest keys that validation reads.
+
+    The document is composed into a node tree and Python objects are built
+    just for the keys in _VALIDATED_KEYS. Documents that are not a plain
+    mapping, or that use merge keys, are constructed in full instead.
+    """
+    loader = YAML_LOADER(stream)
+    try:
+        root = loader.get_single_node()
+        if not isinstance(root, yaml.MappingNode) or any(
+            key_node.tag == _MERGE_TAG for key_node, _ in root.value
+        ):
+            return loader.construct_document(root) if root is not None else None
+        
+        manifest = {}
+        for key_node, value_node in root.value:
+            if isinstance(key_node, yaml.ScalarNode) and key_node.value in _VALIDATED_KEYS:
+                manifest[key_node.value] = loader.construct_object(value_node, deep=True)
+        return manifest
+    finally:
+        loader.dispose()
+
+_VALID_MATURITIES = ['stable', 'beta', 'alpha', 'experimental']
+
+_REQUIRED_TARGET_FIELDS = frozenset({'name', 'metric', 'threshold_ms', 'runner', 'script'})
+
+_MISSING = object()
+
+def _expect(predicate: Callable[[Any], bool], message: str) -> Callable[[Any], List[str]]:
+    """Build a field check that reports ``message`` when ``predicate`` fails."""
+    return lambda value: [] if predicate(value) else [message]
+
+def _check_api_contracts(contracts: Any) -> List[str]:
+    """Check api_contracts is a non-empty list of ``name@version`` strings."""
+    if not isinstance(contracts, list) or not contracts:
+        return ["api_contracts must be a non-empty list"]
+    return [
+        f"Invalid contract format: {contract}"
+        for contract in contracts
+        if not isinstance(contract, str) or '@' not in contract
+    ]
+
+def _check_dependencies(deps: Any) -> List[str]:
+    """Check dependencies lists both internal and external services."""
+    if not isinstance(deps, dict):
+        return ["dependencies must be a dictionary"]
+    errors = []
+    for dep_type in ('internal', 'external'):
+        if dep_type not in deps:
+            errors.append(f"Missing dependency type: {dep_type}")
+        elif not isinstance(deps[dep_type], list):
+            errors.append(f"{dep_type} dependencies must be a list")
+    return errors
+
+def _check_sla(sla: Any) -> List[str]:
+    """Check the SLA declares latency and availability targets."""
+    if not isinstance(sla, dict):
+        return ["sla must be a dictionary"]
+    errors = []
+    if 'p95_latency_ms' not in sla:
+        errors.append("sla must include p95_latency_ms")
+    if 'availability' not in sla:
+        errors.append("sla must include availability")
+    return errors
+
+def _check_performance(performance: Any) -> List[str]:
+    """Check performance targets are complete and have numeric thresholds."""
+    if not isinstance(performance, dict):
+        return ["performance must be a dictionary"]
+    targets = performance.get('targets')
+    if not isinstance(targets, list) or not targets:
+        return ["performance.targets must be a non-empty list"]
+    errors = []
+    for idx, target in enumerate(targets):
+        if not isinstance(target, dict):
+            errors.append(f"performance.targets[{idx}] must be an object")
+            continue
+        missing = _REQUIRED_TARGET_FIELDS - target.keys()
+        if missing:
+            errors.append(
+                f"performance.targets[{idx}] missing required fields: {sorted(missing)}"
+            )
+        elif not isinstance(target.get('threshold_ms'), (int, float)):
+            errors.append(
+                f"performance.targets[{idx}].threshold_ms must be numeric"
+            )
+    return errors
+
+_FIELD_CHECKS = (
+    ('service_name', _expect(lambda v: isinstance(v, str) and bool(v),
+                             "service_name must be a non-empty string")),
+    ('domain', _expect(lambda v: v == 'access', "domain must be 'access'")),
+    ('runtime', _expect(lambda v: v == 'python', "runtime must be 'python'")),
+    ('language_version', _expect(lambda v: v == "3.12", "language_version must be '3.12'")),
+    ('api_contracts', _check_api_contracts),
+    ('dependencies', _check_dependencies),
+    ('maturity', _expect(lambda v: v in _VALID_MATURITIES,
+                         f"maturity must be one of: {_VALID_MATURITIES}")),
+    ('sla', _check_sla),
+    ('owner', _expect(lambda v: v == 'platform', "owner must be 'platform'")),
+    ('performance', _check_performance),
+)
 
 def validate_manifest(manifest_path: Path) -> List[str]:
     """Validate a single service manifest file."""
     errors = []
     
     try:
-        with open(manifest_path, 'r') as f:
-            manifest = yaml.safe_load(f)
+        with open(manifest_path, 'rb') as f:
+            manifest = _load_manifest(f)
     except yaml.YAMLError as e:
         errors.append(f"Invalid YAML: {e}")
         return errors
@@ -24,115 +142,29 @@ def validate_manifest(manifest_path: Path) -> List[str]:
         errors.append(f"Error reading file: {e}")
         return errors
     
-    # Required fields
-    required_fields = [
-        'service_name', 'domain', 'runtime', 'language_version',
-        'api_contracts', 'dependencies', 'maturity', 'sla', 'owner'
-    ]
-    
-    for field in required_fields:
-        if field not in manifest:
-            errors.append(f"Missing required field: {field}")
-    
-    # Validate service_name
-    if 'service_name' in manifest:
-        service_name = manifest['service_name']
-        if not isinstance(service_name, str) or not service_name:
-            errors.append("service_name must be a non-empty string")
+    # Lists, scalars and empty files (None) have no fields to check
+    if not isinstance(manifest, dict):
+        return ["Manifest must be a mapping"]
     
-    # Validate domain
-    if 'domain' in manifest:
-        domain = manifest['domain']
-        if domain != 'access':
-            errors.append("domain must be 'access'")
-    
-    # Validate runtime
-    if 'runtime' in manifest:
-        runtime = manifest['runtime']
-        if runtime != 'python':
-            errors.append("runtime must be 'python'")
-    
-    # Validate language_version
-    if 'language_version' in manifest:
-        lang_version = manifest['language_version']
-        if lang_version != "3.12":
-            errors.append("language_version must be '3.12'")
-    
-    # Validate api_contracts
-    if 'api_contracts' in manifest:
-        contracts = manifest['api_contracts']
-        if not isinstance(contracts, list) or not contracts:
-            errors.append("api_contracts must be a non-empty list")
-        else:
-            for contract in contracts:
-                if not isinstance(contract, str) or '@' not in contract:
-                    errors.append(f"Invalid contract format: {contract}")
-    
-    # Validate dependencies
-    if 'dependencies' in manifest:
-        deps = manifest['dependencies']
-        if not isinstance(deps, dict):
-            errors.append("dependencies must be a dictionary")
-        else:
-            for dep_type in ['internal', 'external']:
-                if dep_type not in deps:
-                    errors.append(f"Missing dependency type: {dep_type}")
-                elif not isinstance(deps[dep_type], list):
-                    errors.append(f"{dep_type} dependencies must be a list")
-    
-    # Validate maturity
-    if 'maturity' in manifest:
-        maturity = manifest['maturity']
-        valid_maturities = ['stable', 'beta', 'alpha', 'experimental']
-        if maturity not in valid_maturities:
-            errors.append(f"maturity must be one of: {valid_maturities}")
-    
-    # Validate SLA
-    if 'sla' in manifest:
-        sla = manifest['sla']
-        if not isinstance(sla, dict):
-            errors.append("sla must be a dictionary")
-        else:
-            if 'p95_latency_ms' not in sla:
-                errors.append("sla must include p95_latency_ms")
-            if 'availability' not in sla:
-                errors.append("sla must include availability")
-    
-    # Validate owner
-    if 'owner' in manifest:
-        owner = manifest['owner']
-        if owner != 'platform':
-            errors.append("owner must be 'platform'")
-
-    # Validate performance targets
-    if 'performance' in manifest:
-        performance = manifest['performance']
-        if not isinstance(performance, dict):
-            errors.append("performance must be a dictionary")
-        else:
-            targets = performance.get('targets')
-            if not isinstance(targets, list) or not targets:
-                errors.append("performance.targets must be a non-empty list")
-            else:
-                required_target_fields = {'name', 'metric', 'threshold_ms', 'runner', 'script'}
-                for idx, target in enumerate(targets):
-                    if not isinstance(target, dict):
-                        errors.append(f"performance.targets[{idx}] must be an object")
-                        continue
-                    missing = required_target_fields - target.keys()
-                    if missing:
-                        errors.append(
-                            f"performance.targets[{idx}] missing required fields: {sorted(missing)}"
-                        )
-                    else:
-                        threshold = target.get('threshold_ms')
-                        if not isinstance(threshold, (int, float)):
-                            errors.append(
-                                f"performance.targets[{idx}].threshold_ms must be numeric"
-                            )
+    # Required fields
+    missing = _REQUIRED_MANIFEST - manifest.keys()
+    errors.extend(f"Missing required field: {field}" for field in sorted(missing))
+    
+    # Per-field checks, in report order
+    for field, check in _FIELD_CHECKS:
+        value = manifest.get(field, _MISSING)
+        if value is not _MISSING:
+            errors.extend(check(value))
 
     return errors
 
+def _validate_service_dir(service_dir: Path) -> Optional[List[str]]:
+    """Validate one service directory's manifest; returns None when it has no manifest."""
+    manifest_path = service_dir / 'service-manifest.yaml'
+    if not manifest_path.exists():
+        return None
+    return validate_manifest(manifest_path)
+
 def main():
     """Main function to validate all service manifests."""
     print("Validating service manifests...")
@@ -146,16 +178,18 @@ def main():
     
     total_errors = 0
     
-    for service_dir in sorted(service_dirs):
-        manifest_path = service_dir / 'service-manifest.yaml'
-        
-        if not manifest_path.exists():
+    service_dirs.sort()
+    
+    # Manifests are independent; validate them concurrently and report in order
+    with ThreadPoolExecutor(max_workers=len(service_dirs)) as executor:
+        results = list(executor.map(_validate_service_dir, service_dirs))
+    
+    for service_dir, errors in zip(service_dirs, results):
+        if errors is None:
             print(f"❌ {service_dir.name}: service-manifest.yaml not found")
             total_errors += 1
             continue
         
-        errors = validate_manifest(manifest_path)
-        
         if errors:
             print(f"❌ {service_dir.name}: {len(errors)} validation errors")
             for error in errors:
@@ -15,6 +15,11 @@ from typing import Optional
 import sys
 import os
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from service_gateway.app.adapters.served_data_client import ServedDataClient  # noqa: E402
@@ -65,6 +70,13 @@ async def _noop_async(*args, **kwargs):  # type: ignore[no-untyped-def]
     return True
 
 
+def _format_summary(summary: dict) -> str:
+    """Render the warm summary as indented JSON, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(summary, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(summary, indent=2)
+
+
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Warm Redis caches for hot served queries.")
     parser.add_argument("--redis-url", default=os.getenv("ACCESS_REDIS_URL", "redis://localhost:6379/0"), help="Redis connection URL")
@@ -101,10 +113,11 @@ def main() -> int:
     if args.dry_run:
         print("[cache-warm] DRY RUN - no Redis writes executed")
 
-    print(json.dumps(summary, indent=2))
+    payload = _format_summary(summary)
+    print(payload)
 
     if args.output:
-        args.output.write_text(json.dumps(summary, indent=2))
+        args.output.write_text(payload)
 
     return 0
 
@@ -2,12 +2,17 @@
 JWKS client for Keycloak integration.
 """
 
+import asyncio
+import base64
+import random
 import time
 import httpx
+from email.utils import parsedate_to_datetime
 from typing import Dict, Any, Optional
-from jose import jwt, jwk
-from jose.exceptions import JWTError
-import json
+import jwt
+import orjson
+from jwt.algorithms import RSAAlgorithm
+from jwt.exceptions import InvalidTokenError, PyJWTError
 import sys
 import os
 
@@ -17,109 +22,341 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 from shared.logging import get_logger
 from shared.circuit_breaker import circuit_breaker_manager
 
+# JWKS fetches are small; fail fast on an unreachable Keycloak
+JWKS_TIMEOUT = httpx.Timeout(5.0, connect=1.5)
+JWKS_LIMITS = httpx.Limits(max_keepalive_connections=5, max_connections=10)
+
+# Background refreshes fire once this fraction of the cache lifetime has elapsed
+PROACTIVE_REFRESH_FRACTION = 0.8
+
+# Retry delays (seconds) after failed background refreshes, before jitter
+REFRESH_BACKOFF_BASE = 1.0
+REFRESH_BACKOFF_MAX = 60.0
+
+# Keycloak signs with RS256 only; anything else is rejected before key lookup
+TOKEN_ALGORITHM = "RS256"
+_DECODE_ALGORITHMS = [TOKEN_ALGORITHM]
+_DECODE_OPTIONS = {"verify_aud": False}
+
+
+def _peek_header(token: str) -> Dict[str, Any]:
+    """Read a JWT header without decoding the rest of the token."""
+    dot = token.find(".")
+    header_b64 = token[:dot] if dot >= 0 else token
+    padding = "=" * (-len(header_b64) % 4)
+    try:
+        header = orjson.loads(base64.urlsafe_b64decode(header_b64 + padding))
+    except ValueError as e:
+        raise InvalidTokenError(f"Invalid token header: {e}")
+    if not isinstance(header, dict):
+        raise InvalidTokenError("Invalid token header: not a JSON object")
+    return header
+
 
 class JWKSClient:
     """Client for fetching and caching JWKS from Keycloak."""
     
-    def __init__(self, jwks_url: str, cache_ttl: int = 3600):
+    def __init__(
+        self,
+        jwks_url: str,
+        cache_ttl: int = 3600,
+        http_client: Optional[httpx.AsyncClient] = None,
+        min_cache_ttl: int = 60,
+        stale_while_error_ttl: int = 86400
+    ):
         self.jwks_url = jwks_url
         self.cache_ttl = cache_ttl
+        self.min_cache_ttl = min_cache_ttl
+        self.stale_while_error_ttl = stale_while_error_ttl
         self.logger = get_logger("auth.jwks")
         
-        # Cache for JWKS
+        # Cache for JWKS; the lifetime follows the response's caching headers and
+        # the timestamp is on the monotonic clock so wall-clock steps cannot skew it
         self._jwks_cache: Optional[Dict[str, Any]] = None
         self._cache_timestamp: float = 0
+        self._cache_lifetime: float = cache_ttl
         
-        # Cache for individual keys
-        self._key_cache: Dict[str, Any] = {}
+        # Validators sent on revalidation so an unchanged JWKS comes back as a 304
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        
+        # Keys indexed by kid, rebuilt whenever a different JWKS document is served
+        self._kid_index: Dict[str, Dict[str, Any]] = {}
+        self._kid_index_source: Optional[Dict[str, Any]] = None
+        
+        # Public keys by kid, constructed whenever the kid index is rebuilt
+        self._rsa_key_cache: Dict[str, Any] = {}
+        
+        # In-flight refresh shared by every caller that misses the cache, so
+        # concurrent misses trigger a single fetch
+        self._refresh_task: Optional[asyncio.Task] = None
+        
+        # Loop that refreshes the JWKS ahead of expiry, started by the service
+        self._background_task: Optional[asyncio.Task] = None
+        
+        # Long-lived HTTP client so refreshes reuse keep-alive connections; a
+        # client passed in by the caller is shared and left for it to close
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            timeout=JWKS_TIMEOUT,
+            limits=JWKS_LIMITS
+        )
         
-        # Circuit breaker for Keycloak calls
-        self.circuit_breaker = circuit_breaker_manager.get_breaker(
-            "keycloak-jwks",
+        # Circuit breaker for Keycloak calls, shared process-wide per JWKS URL so
+        # every client talking to the same Keycloak sees one failure state
+        self.circuit_breaker = circuit_breaker_manager.get_circuit_breaker(
+            f"keycloak-jwks:{jwks_url}",
             failure_threshold=5,
             recovery_timeout=30,
             expected_exception=httpx.HTTPError
         )
     
+    async def close(self) -> None:
+        """Stop background refreshes and close the HTTP client if this client created it."""
+        await self.stop_background_refresh()
+        if self._owns_client:
+            await self._client.aclose()
+    
+    async def preload(self) -> None:
+        """Load JWKS eagerly so the first request does not pay the Keycloak round-trip.
+
+        Failures are logged rather than raised; the lazy path in get_jwks still
+        fetches on first use.
+        """
+        try:
+            await self.get_jwks()
+        except Exception as e:
+            self.logger.warning("JWKS preload failed", error=str(e))
+    
     async def get_jwks(self) -> Dict[str, Any]:
         """Get JWKS from cache or fetch from Keycloak."""
-        current_time = time.time()
-        
         # Check if cache is valid
-        if (self._jwks_cache is not None and 
-            current_time - self._cache_timestamp < self.cache_ttl):
+        current_time = time.monotonic()
+        if self._cache_is_fresh(current_time):
             return self._jwks_cache
         
+        try:
+            return await self._shared_refresh(current_time)
+        except Exception:
+            # Serve the stale cache through an upstream outage, within bounds
+            if self._cache_is_within_stale_window(time.monotonic()):
+                self.logger.warning("Using stale JWKS cache due to fetch failure")
+                return self._jwks_cache
+            raise
+    
+    async def _shared_refresh(self, current_time: float) -> Dict[str, Any]:
+        """Join the in-flight refresh, starting one if none is running."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_jwks(current_time))
+            self._refresh_task.add_done_callback(self._on_refresh_done)
+        
+        # Shielded so a cancelled caller does not abort the fetch for the others
+        return await asyncio.shield(self._refresh_task)
+    
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        """Release the finished refresh so the next miss starts a new one."""
+        if self._refresh_task is task:
+            self._refresh_task = None
+        # Mark the outcome retrieved; every waiter may have been cancelled
+        if not task.cancelled():
+            task.exception()
+    
+    def _cache_is_fresh(self, current_time: float) -> bool:
+        """Check whether the cached JWKS is still within its freshness lifetime."""
+        return (self._jwks_cache is not None and
+                current_time - self._cache_timestamp < self._cache_lifetime)
+    
+    def _cache_is_within_stale_window(self, current_time: float) -> bool:
+        """Check whether the cached JWKS may still be served while Keycloak is failing."""
+        return (self._jwks_cache is not None and
+                current_time - self._cache_timestamp <
+                self._cache_lifetime + self.stale_while_error_ttl)
+    
+    def start_background_refresh(self) -> None:
+        """Start refreshing the JWKS ahead of expiry so requests never wait on Keycloak."""
+        if self._background_task is None:
+            self._background_task = asyncio.create_task(self._background_refresh_loop())
+    
+    async def stop_background_refresh(self) -> None:
+        """Cancel the background refresh loop, if running."""
+        task, self._background_task = self._background_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _background_refresh_loop(self) -> None:
+        """Refresh at PROACTIVE_REFRESH_FRACTION of the lifetime, backing off on failure."""
+        failures = 0
+        while True:
+            if failures:
+                backoff = min(REFRESH_BACKOFF_BASE * 2 ** (failures - 1), REFRESH_BACKOFF_MAX)
+                delay = backoff * random.uniform(0.5, 1.0)
+            elif self._jwks_cache is None:
+                delay = 0.0
+            else:
+                delay = (self._cache_timestamp +
+                         PROACTIVE_REFRESH_FRACTION * self._cache_lifetime - time.monotonic())
+            await asyncio.sleep(max(delay, 0.0))
+            
+            try:
+                await self._shared_refresh(time.monotonic())
+                failures = 0
+            except Exception:
+                # Already logged by _refresh_jwks; requests keep the stale cache
+                failures += 1
+    
+    def _freshness_lifetime(self, headers: httpx.Headers) -> float:
+        """Derive how long a JWKS response stays fresh from its caching headers.
+        
+        Cache-Control max-age takes precedence over Expires; without either the
+        configured cache_ttl applies. The result is clamped to
+        [min_cache_ttl, cache_ttl] so a no-cache response cannot force a
+        Keycloak round-trip on every verification.
+        """
+        lifetime: Optional[float] = None
+        
+        for directive in headers.get("Cache-Control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            name = name.lower()
+            if name in ("no-cache", "no-store"):
+                lifetime = 0.0
+                break
+            if name == "max-age":
+                try:
+                    lifetime = float(value.strip('"'))
+                except ValueError:
+                    pass
+        
+        if lifetime is None and "Expires" in headers:
+            try:
+                expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+                date = (parsedate_to_datetime(headers["Date"]).timestamp()
+                        if "Date" in headers else time.time())
+                lifetime = expires - date
+            except (TypeError, ValueError):
+                # An unparseable Expires means the response is already stale
+                lifetime = 0.0
+        
+        if lifetime is None:
+            return float(self.cache_ttl)
+        return min(max(lifetime, self.min_cache_ttl), self.cache_ttl)
+    
+    def _request_headers(self) -> Dict[str, str]:
+        """Build JWKS request headers, conditional when a document is cached."""
+        headers = {"Accept": "application/json"}
+        if self._jwks_cache is not None:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+        return headers
+    
+    async def _refresh_jwks(self, current_time: float) -> Dict[str, Any]:
+        """Fetch fresh JWKS and store it in the cache."""
         # Fetch fresh JWKS with circuit breaker
         try:
             async def _fetch_jwks():
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    response = await client.get(self.jwks_url)
+                response = await self._client.get(
+                    self.jwks_url,
+                    headers=self._request_headers(),
+                    timeout=JWKS_TIMEOUT
+                )
+                # A 304 only makes sense while there is a cached document to reuse
+                if response.status_code != 304 or self._jwks_cache is None:
                     response.raise_for_status()
-                    return response.json()
+                return response
+            
+            response = await self.circuit_breaker.call(_fetch_jwks)
             
-            jwks_data = await self.circuit_breaker.call(_fetch_jwks)
+            if response.status_code == 304:
+                self.logger.info("JWKS revalidated, keys unchanged")
+            else:
+                self._jwks_cache = response.json()
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
+                
+                self.logger.info(
+                    "JWKS refreshed successfully",
+                    keys_count=len(self._jwks_cache.get("keys", []))
+                )
             
-            self._jwks_cache = jwks_data
             self._cache_timestamp = current_time
+            self._cache_lifetime = self._freshness_lifetime(response.headers)
             
-            self.logger.info(
-                "JWKS refreshed successfully",
-                keys_count=len(self._jwks_cache.get("keys", []))
-            )
+            # Index off the request path; get_key reuses it while the document is unchanged
+            if self._jwks_cache is not self._kid_index_source:
+                self._index_keys(self._jwks_cache)
             
             return self._jwks_cache
                 
         except Exception as e:
             self.logger.error("Failed to fetch JWKS", error=str(e))
-            # Return cached data if available, even if stale
-            if self._jwks_cache is not None:
-                self.logger.warning("Using stale JWKS cache due to fetch failure")
-                return self._jwks_cache
             raise
     
     async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
         """Get a specific key by key ID."""
-        # Check key cache first
-        if kid in self._key_cache:
-            return self._key_cache[kid]
-        
-        # Get JWKS
         jwks = await self.get_jwks()
         
-        # Find the key
-        for key in jwks.get("keys", []):
-            if key.get("kid") == kid:
-                self._key_cache[kid] = key
-                return key
+        if jwks is not self._kid_index_source:
+            self._index_keys(jwks)
         
-        self.logger.warning("Key not found", kid=kid)
-        return None
+        key = self._kid_index.get(kid)
+        if key is None:
+            self.logger.warning("Key not found", kid=kid)
+        return key
+    
+    def _index_keys(self, jwks: Dict[str, Any]) -> None:
+        """Index a JWKS document by kid and pre-construct its RSA public keys."""
+        self._kid_index = {
+            key["kid"]: key for key in jwks.get("keys", []) if key.get("kid")
+        }
+        self._kid_index_source = jwks
+        self._rsa_key_cache.clear()
+        
+        for kid, key_data in self._kid_index.items():
+            if key_data.get("kty") != "RSA":
+                continue
+            try:
+                self._rsa_key_cache[kid] = RSAAlgorithm.from_jwk(key_data)
+            except (PyJWTError, ValueError) as e:
+                # Left for verify_token, which reports the failure per token
+                self.logger.warning("Failed to construct JWKS key", kid=kid, error=str(e))
     
     async def verify_token(self, token: str) -> Dict[str, Any]:
         """Verify JWT token and return claims."""
         try:
-            # Decode header to get key ID
-            unverified_header = jwt.get_unverified_header(token)
-            kid = unverified_header.get("kid")
+            # Read the key ID from the header segment only
+            header = _peek_header(token)
+            
+            if header.get("alg") != TOKEN_ALGORITHM:
+                raise InvalidTokenError(f"Unsupported algorithm: {header.get('alg')}")
             
+            kid = header.get("kid")
             if not kid:
-                raise JWTError("Token missing key ID")
+                raise InvalidTokenError("Token missing key ID")
             
             # Get the key
             key_data = await self.get_key(kid)
             if not key_data:
-                raise JWTError(f"Key not found: {kid}")
+                raise InvalidTokenError(f"Key not found: {kid}")
             
-            # Convert JWK to RSA key
-            rsa_key = jwk.construct(key_data)
+            # Convert JWK to RSA key once per kid
+            rsa_key = self._rsa_key_cache.get(kid)
+            if rsa_key is None:
+                rsa_key = RSAAlgorithm.from_jwk(key_data)
+                self._rsa_key_cache[kid] = rsa_key
             
-            # Verify and decode token
-            payload = jwt.decode(
+            # Verify and decode token (exp is verified by default); the RSA check
+            # runs in a worker thread, where OpenSSL releases the GIL
+            payload = await asyncio.to_thread(
+                jwt.decode,
                 token,
                 rsa_key,
-                algorithms=["RS256"],
-                options={"verify_exp": True, "verify_aud": False}
+                algorithms=_DECODE_ALGORITHMS,
+                options=_DECODE_OPTIONS
             )
             
             self.logger.info(
@@ -130,16 +367,21 @@ class JWKSClient:
             
             return payload
             
-        except JWTError as e:
+        except PyJWTError as e:
             self.logger.warning("Token verification failed", error=str(e))
             raise
         except Exception as e:
             self.logger.error("Unexpected error during token verification", error=str(e))
-            raise JWTError(f"Token verification failed: {str(e)}")
+            raise InvalidTokenError(f"Token verification failed: {str(e)}")
     
     def clear_cache(self):
         """Clear all caches."""
         self._jwks_cache = None
         self._cache_timestamp = 0
-        self._key_cache.clear()
+        self._cache_lifetime = self.cache_ttl
+        self._etag = None
+        self._last_modified = None
+        self._kid_index = {}
+        self._kid_index_source = None
+        self._rsa_key_cache.clear()
         self.logger.info("JWKS cache cleared")
@@ -6,6 +6,8 @@ import sys
 import os
 import time
 import asyncio
+import httpx
+from fastapi.responses import ORJSONResponse
 
 # Add shared directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -18,9 +20,21 @@ from .validation.token_validator import TokenValidator, TokenVerificationRequest
 class AuthService(BaseService):
     """Auth service implementation."""
     
+    default_response_class = ORJSONResponse
+    
+    # Handlers are short await chains; pin uvloop and httptools from uvicorn[standard]
+    uvicorn_loop = "uvloop"
+    uvicorn_http = "httptools"
+    
     def __init__(self):
         super().__init__("auth", 8010)
-        self.token_validator = TokenValidator(self.config.jwks_url)
+        
+        # One pooled client for all Keycloak traffic: JWKS fetches and health checks
+        self._http_client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+        )
+        self.token_validator = TokenValidator(self.config.jwks_url, http_client=self._http_client)
         
         # Initialize observability
         self.observability = get_observability_manager(
@@ -30,6 +44,16 @@ class AuthService(BaseService):
             enable_console=self.config.enable_console_tracing
         )
         
+        @self.app.on_event("startup")
+        async def _startup():
+            await self.token_validator.preload()
+            self.token_validator.start_background_refresh()
+        
+        @self.app.on_event("shutdown")
+        async def _shutdown():
+            await self.token_validator.close()
+            await self._http_client.aclose()
+        
         self._setup_auth_routes()
     
     def _setup_auth_routes(self):
@@ -38,11 +62,11 @@ class AuthService(BaseService):
         @self.app.get("/")
         async def root():
             """Root endpoint."""
-            return {
+            return ORJSONResponse({
                 "service": "auth",
                 "message": "254Carbon Access Layer - Auth Service",
                 "version": "1.0.0"
-            }
+            })
         
         @self.app.post("/auth/verify")
         @observe_function("auth_verify_token")
@@ -51,11 +75,9 @@ class AuthService(BaseService):
             start_time = time.time()
             
             try:
-                response = await self.token_validator.verify_token(request.token)
+                response, user_info = await self.token_validator.verify_and_extract(request.token)
                 
                 if response.valid:
-                    user_info = await self.token_validator.get_user_info(request.token)
-                    
                     # Set user context for logging
                     self.observability.trace_request(
                         user_id=user_info.get("user_id"),
@@ -69,11 +91,11 @@ class AuthService(BaseService):
                         tenant_id=user_info.get("tenant_id")
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": True,
                         "claims": response.claims,
                         "user_info": user_info
-                    }
+                    })
                 else:
                     # Log failed verification
                     self.observability.log_error(
@@ -81,10 +103,10 @@ class AuthService(BaseService):
                         response.error
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": False,
                         "error": response.error
-                    }
+                    })
             except Exception as e:
                 duration = time.time() - start_time
                 self.observability.log_error(
@@ -92,10 +114,10 @@ class AuthService(BaseService):
                     str(e),
                     duration=duration
                 )
-                return {
+                return ORJSONResponse({
                     "valid": False,
                     "error": str(e)
-                }
+                })
         
         @self.app.post("/auth/verify-ws")
         @observe_function("auth_verify_websocket_token")
@@ -104,11 +126,9 @@ class AuthService(BaseService):
             start_time = time.time()
             
             try:
-                response = await self.token_validator.verify_token(request.token)
+                response, user_info = await self.token_validator.verify_and_extract(request.token)
                 
                 if response.valid:
-                    user_info = await self.token_validator.get_user_info(request.token)
-                    
                     # Set user context for logging
                     self.observability.trace_request(
                         user_id=user_info.get("user_id"),
@@ -122,11 +142,11 @@ class AuthService(BaseService):
                         tenant_id=user_info.get("tenant_id")
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": True,
                         "claims": response.claims,
                         "user_info": user_info
-                    }
+                    })
                 else:
                     # Log failed verification
                     self.observability.log_error(
@@ -134,10 +154,10 @@ class AuthService(BaseService):
                         response.error
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": False,
                         "error": response.error
-                    }
+                    })
             except Exception as e:
                 duration = time.time() - start_time
                 self.observability.log_error(
@@ -145,10 +165,10 @@ class AuthService(BaseService):
                     str(e),
                     duration=duration
                 )
-                return {
+                return ORJSONResponse({
                     "valid": False,
                     "error": str(e)
-                }
+                })
         
         @self.app.post("/auth/refresh")
         @observe_function("auth_refresh_token")
@@ -175,14 +195,14 @@ class AuthService(BaseService):
                         tenant_id=user_info.get("tenant_id")
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": True,
                         "access_token": response.access_token,
                         "refresh_token": response.refresh_token,
                         "expires_in": response.expires_in,
                         "token_type": response.token_type,
                         "user_info": user_info
-                    }
+                    })
                 else:
                     # Log failed refresh
                     self.observability.log_error(
@@ -190,10 +210,10 @@ class AuthService(BaseService):
                         response.error
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "valid": False,
                         "error": response.error
-                    }
+                    })
             except Exception as e:
                 duration = time.time() - start_time
                 self.observability.log_error(
@@ -201,10 +221,10 @@ class AuthService(BaseService):
                     str(e),
                     duration=duration
                 )
-                return {
+                return ORJSONResponse({
                     "valid": False,
                     "error": str(e)
-                }
+                })
         
         @self.app.post("/auth/logout")
         @observe_function("auth_logout")
@@ -232,10 +252,10 @@ class AuthService(BaseService):
                     tenant_id=user_info.get("tenant_id")
                 )
                 
-                return {
+                return ORJSONResponse({
                     "success": True,
                     "message": "Logged out successfully"
-                }
+                })
             except Exception as e:
                 duration = time.time() - start_time
                 self.observability.log_error(
@@ -243,10 +263,10 @@ class AuthService(BaseService):
                     str(e),
                     duration=duration
                 )
-                return {
+                return ORJSONResponse({
                     "success": False,
                     "error": str(e)
-                }
+                })
         
         @self.app.get("/auth/users/{user_id}")
         @observe_function("auth_get_user_info")
@@ -271,7 +291,7 @@ class AuthService(BaseService):
                         tenant_id=user_info.get("tenant_id")
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "user_id": user_info.get("id"),
                         "username": user_info.get("username"),
                         "email": user_info.get("email"),
@@ -279,7 +299,7 @@ class AuthService(BaseService):
                         "roles": user_info.get("roles", []),
                         "created_at": user_info.get("created_at"),
                         "updated_at": user_info.get("updated_at")
-                    }
+                    })
                 else:
                     # Log user not found
                     self.observability.log_error(
@@ -287,9 +307,9 @@ class AuthService(BaseService):
                         f"User {user_id} not found"
                     )
                     
-                    return {
+                    return ORJSONResponse({
                         "error": "User not found"
-                    }
+                    })
             except Exception as e:
                 duration = time.time() - start_time
                 self.observability.log_error(
@@ -298,23 +318,25 @@ class AuthService(BaseService):
                     duration=duration,
                     user_id=user_id
                 )
-                return {
+                return ORJSONResponse({
                     "error": str(e)
-                }
+                })
     
     async def _check_dependencies(self):
         """Check auth dependencies."""
         dependencies = {}
         
-        # Check Keycloak JWKS endpoint
+        # Check Keycloak JWKS endpoint; an open breaker already knows it is down
+        if self.token_validator.jwks_client.circuit_breaker.is_open():
+            dependencies["keycloak"] = "error"
+            return dependencies
+        
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.get(self.config.jwks_url, timeout=5.0)
-                if response.status_code == 200:
-                    dependencies["keycloak"] = "ok"
-                else:
-                    dependencies["keycloak"] = "error"
+            response = await self._http_client.get(self.config.jwks_url, timeout=5.0)
+            if response.status_code == 200:
+                dependencies["keycloak"] = "ok"
+            else:
+                dependencies["keycloak"] = "error"
         except Exception:
             dependencies["keycloak"] = "error"
         
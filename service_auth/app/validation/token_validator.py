@@ -2,8 +2,14 @@
 Token validation service for Auth service.
 """
 
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
+import asyncio
+import hashlib
+import time
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Tuple
+import httpx
+from cachetools import TLRUCache, TTLCache
+from pydantic import BaseModel, ConfigDict
 import sys
 import os
 
@@ -14,6 +20,77 @@ from shared.logging import get_logger
 from shared.errors import AuthenticationError
 from ..jwks.client import JWKSClient
 
+BEARER_PREFIX = "Bearer "
+
+# Verified claims are reused until the token expires, but never for longer than this
+TOKEN_CACHE_MAX_TTL = 300.0
+TOKEN_CACHE_MAX_SIZE = 10_000
+
+# Revoked token digests are kept until the token expires; tokens without exp for this long
+REVOKED_TOKEN_MAX_TTL = 86400.0
+REVOKED_TOKEN_MAX_SIZE = 100_000
+
+# Lifetime (seconds) of access tokens issued on refresh
+ACCESS_TOKEN_TTL = 3600
+
+# User lookups are read through a short-lived cache to spare Keycloak
+USER_CACHE_TTL = 60.0
+USER_CACHE_MAX_SIZE = 10_000
+
+# Stand-in for Keycloak's user store, built once at import
+_MOCK_USERS = MappingProxyType({
+    "user1": {
+        "id": "user1",
+        "username": "john.doe",
+        "email": "john.doe@254carbon.com",
+        "tenant_id": "tenant-1",
+        "roles": ["user", "analyst"],
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z"
+    },
+    "user2": {
+        "id": "user2",
+        "username": "jane.smith",
+        "email": "jane.smith@254carbon.com",
+        "tenant_id": "tenant-2",
+        "roles": ["user", "admin"],
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z"
+    },
+    "admin": {
+        "id": "admin",
+        "username": "admin",
+        "email": "admin@254carbon.com",
+        "tenant_id": "tenant-1",
+        "roles": ["admin", "superuser"],
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z"
+    }
+})
+
+
+def _token_cache_expiry(_key: bytes, claims: Dict[str, Any], now: float) -> float:
+    """Expire a cached verification at the token's exp claim, capped at TOKEN_CACHE_MAX_TTL."""
+    ttl = TOKEN_CACHE_MAX_TTL
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        ttl = min(exp - time.time(), ttl)
+    return now + ttl
+
+
+def _revocation_expiry(_key: bytes, exp: Optional[float], now: float) -> float:
+    """Forget a revoked token once its exp has passed and it can no longer verify."""
+    ttl = REVOKED_TOKEN_MAX_TTL
+    if isinstance(exp, (int, float)):
+        ttl = exp - time.time()
+    return now + ttl
+
+
+def _token_digest(token: str) -> bytes:
+    """Key a token for the in-process caches."""
+    # Non-cryptographic use: the digest only needs to be a collision-resistant key
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
 
 class TokenVerificationRequest(BaseModel):
     """Request model for token verification."""
@@ -22,6 +99,8 @@ class TokenVerificationRequest(BaseModel):
 
 class TokenVerificationResponse(BaseModel):
     """Response model for token verification."""
+    model_config = ConfigDict(frozen=True)
+    
     valid: bool
     claims: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
@@ -29,6 +108,8 @@ class TokenVerificationResponse(BaseModel):
 
 class TokenRefreshResponse(BaseModel):
     """Response model for token refresh."""
+    model_config = ConfigDict(frozen=True)
+    
     valid: bool
     access_token: Optional[str] = None
     refresh_token: Optional[str] = None
@@ -37,22 +118,68 @@ class TokenRefreshResponse(BaseModel):
     error: Optional[str] = None
 
 
+# Shared responses for failures with fixed messages; the models are frozen
+_TOKEN_REVOKED = TokenVerificationResponse(valid=False, error="Token revoked")
+_INVALID_REFRESH_TYPE = TokenRefreshResponse(valid=False, error="Invalid refresh token type")
+_REFRESH_MISSING_USER_ID = TokenRefreshResponse(valid=False, error="Refresh token missing user ID")
+_REFRESH_USER_NOT_FOUND = TokenRefreshResponse(valid=False, error="User not found")
+_REFRESH_TOKEN_REVOKED = TokenRefreshResponse(valid=False, error="Token revoked")
+
+
 class TokenValidator:
     """Token validation service."""
     
-    def __init__(self, jwks_url: str):
-        self.jwks_client = JWKSClient(jwks_url)
+    def __init__(self, jwks_url: str, http_client: Optional[httpx.AsyncClient] = None):
+        self.jwks_client = JWKSClient(jwks_url, http_client=http_client)
         self.logger = get_logger("auth.validator")
+        
+        # Verified claims keyed by token digest; only successful verifications are cached
+        self._token_cache: TLRUCache = TLRUCache(
+            maxsize=TOKEN_CACHE_MAX_SIZE,
+            ttu=_token_cache_expiry,
+            timer=time.monotonic
+        )
+        
+        # Digests of tokens revoked through this process, checked before the claims cache
+        self._revoked_tokens: TLRUCache = TLRUCache(
+            maxsize=REVOKED_TOKEN_MAX_SIZE,
+            ttu=_revocation_expiry,
+            timer=time.monotonic
+        )
+        
+        # User records by ID, plus one event per lookup in flight so concurrent
+        # misses for the same user share a single fetch
+        self._user_cache: TTLCache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+        self._user_inflight: Dict[str, asyncio.Event] = {}
+    
+    async def preload(self) -> None:
+        """Warm the JWKS cache ahead of the first verification."""
+        await self.jwks_client.preload()
+    
+    def start_background_refresh(self) -> None:
+        """Keep the JWKS cache warm in the background."""
+        self.jwks_client.start_background_refresh()
+    
+    async def close(self) -> None:
+        """Release the JWKS client's HTTP resources."""
+        await self.jwks_client.close()
     
     async def verify_token(self, token: str) -> TokenVerificationResponse:
         """Verify a JWT token."""
         try:
             # Remove Bearer prefix if present
-            if token.startswith("Bearer "):
-                token = token[7:]
+            token = token.removeprefix(BEARER_PREFIX)
             
-            # Verify token
-            claims = await self.jwks_client.verify_token(token)
+            cache_key = _token_digest(token)
+            if cache_key in self._revoked_tokens:
+                self.logger.warning("Token verification failed", error=_TOKEN_REVOKED.error)
+                return _TOKEN_REVOKED
+            
+            claims = self._token_cache.get(cache_key)
+            if claims is None:
+                # Verify token
+                claims = await self.jwks_client.verify_token(token)
+                self._token_cache[cache_key] = claims
             
             return TokenVerificationResponse(
                 valid=True,
@@ -82,6 +209,25 @@ class TokenValidator:
         """Get user information from token claims."""
         claims = await self.extract_claims(token)
         
+        return self._user_info_from_claims(claims)
+    
+    async def verify_and_extract(
+        self, token: str
+    ) -> Tuple[TokenVerificationResponse, Optional[Dict[str, Any]]]:
+        """Verify a token once and derive user information from its claims.
+        
+        Returns the verification response and the user info, which is None
+        when the token is invalid.
+        """
+        response = await self.verify_token(token)
+        if not response.valid:
+            return response, None
+        
+        return response, self._user_info_from_claims(response.claims)
+    
+    @staticmethod
+    def _user_info_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the user information view of verified token claims."""
         return {
             "user_id": claims.get("sub"),
             "tenant_id": claims.get("tenant_id"),
@@ -97,25 +243,27 @@ class TokenValidator:
         """Refresh an access token using refresh token."""
         try:
             # Remove Bearer prefix if present
-            if refresh_token.startswith("Bearer "):
-                refresh_token = refresh_token[7:]
+            refresh_token = refresh_token.removeprefix(BEARER_PREFIX)
+            
+            if _token_digest(refresh_token) in self._revoked_tokens:
+                return self._refresh_failed(_REFRESH_TOKEN_REVOKED)
             
             # Verify refresh token
             claims = await self.jwks_client.verify_token(refresh_token)
             
             # Check if it's a refresh token
             if claims.get("typ") != "Refresh":
-                raise AuthenticationError("Invalid refresh token type")
+                return self._refresh_failed(_INVALID_REFRESH_TYPE)
             
             # Extract user ID from refresh token
             user_id = claims.get("sub")
             if not user_id:
-                raise AuthenticationError("Refresh token missing user ID")
+                return self._refresh_failed(_REFRESH_MISSING_USER_ID)
             
             # Get user info from Keycloak
             user_info = await self.get_user_by_id(user_id)
             if not user_info:
-                raise AuthenticationError("User not found")
+                return self._refresh_failed(_REFRESH_USER_NOT_FOUND)
             
             # Generate new token pair (in real implementation, this would call Keycloak)
             new_tokens = await self._generate_new_tokens(user_info)
@@ -135,6 +283,11 @@ class TokenValidator:
                 error=str(e)
             )
     
+    def _refresh_failed(self, response: TokenRefreshResponse) -> TokenRefreshResponse:
+        """Log a refresh failure and return its prebuilt response."""
+        self.logger.warning("Token refresh failed", error=response.error)
+        return response
+    
     async def revoke_token(self, token: str) -> bool:
         """Revoke a token (logout)."""
         try:
@@ -145,8 +298,12 @@ class TokenValidator:
             if not user_id:
                 return False
             
-            # In real implementation, this would call Keycloak logout endpoint
-            # For now, we just log the revocation
+            # In real implementation, this would call Keycloak logout endpoint.
+            # Locally the token is rejected from now on, cached claims included.
+            cache_key = _token_digest(token.removeprefix(BEARER_PREFIX))
+            self._revoked_tokens[cache_key] = user_info.get("exp")
+            self._token_cache.pop(cache_key, None)
+            
             self.logger.info(
                 "Token revoked",
                 user_id=user_id,
@@ -160,41 +317,34 @@ class TokenValidator:
             return False
     
     async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get user information by user ID, reading through the user cache."""
+        user = self._user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        inflight = self._user_inflight.get(user_id)
+        if inflight is not None:
+            await inflight.wait()
+            return self._user_cache.get(user_id)
+        
+        event = asyncio.Event()
+        self._user_inflight[user_id] = event
+        try:
+            user = await self._fetch_user_by_id(user_id)
+            # Misses are not cached so newly created users show up immediately
+            if user is not None:
+                self._user_cache[user_id] = user
+            return user
+        finally:
+            del self._user_inflight[user_id]
+            event.set()
+    
+    async def _fetch_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user information by user ID from Keycloak."""
         try:
             # In real implementation, this would call Keycloak user info endpoint
-            # For now, return mock user data
-            mock_users = {
-                "user1": {
-                    "id": "user1",
-                    "username": "john.doe",
-                    "email": "john.doe@254carbon.com",
-                    "tenant_id": "tenant-1",
-                    "roles": ["user", "analyst"],
-                    "created_at": "2024-01-01T00:00:00Z",
-                    "updated_at": "2024-01-01T00:00:00Z"
-                },
-                "user2": {
-                    "id": "user2",
-                    "username": "jane.smith",
-                    "email": "jane.smith@254carbon.com",
-                    "tenant_id": "tenant-2",
-                    "roles": ["user", "admin"],
-                    "created_at": "2024-01-01T00:00:00Z",
-                    "updated_at": "2024-01-01T00:00:00Z"
-                },
-                "admin": {
-                    "id": "admin",
-                    "username": "admin",
-                    "email": "admin@254carbon.com",
-                    "tenant_id": "tenant-1",
-                    "roles": ["admin", "superuser"],
-                    "created_at": "2024-01-01T00:00:00Z",
-                    "updated_at": "2024-01-01T00:00:00Z"
-                }
-            }
-            
-            return mock_users.get(user_id)
+            # For now, look the user up in the static mock table
+            return _MOCK_USERS.get(user_id)
             
         except Exception as e:
             self.logger.error("Failed to get user by ID", user_id=user_id, error=str(e))
@@ -203,19 +353,16 @@ class TokenValidator:
     async def _generate_new_tokens(self, user_info: Dict[str, Any]) -> Dict[str, Any]:
         """Generate new access and refresh tokens."""
         # In real implementation, this would call Keycloak token endpoint
-        # For now, return mock tokens
-        import time
-        from datetime import datetime, timedelta
-        
-        now = datetime.utcnow()
-        expires_in = 3600  # 1 hour
+        # For now, return mock tokens stamped from one clock read
+        issued_at = int(time.time())
+        user_id = user_info['id']
         
         # Mock token generation
-        access_token = f"mock_access_token_{user_info['id']}_{int(now.timestamp())}"
-        refresh_token = f"mock_refresh_token_{user_info['id']}_{int(now.timestamp())}"
+        access_token = f"mock_access_token_{user_id}_{issued_at}"
+        refresh_token = f"mock_refresh_token_{user_id}_{issued_at}"
         
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "expires_in": expires_in
+            "expires_in": ACCESS_TOKEN_TTL
         }
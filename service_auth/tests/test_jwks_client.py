@@ -2,6 +2,10 @@
 Unit tests for JWKSClient.
 """
 
+import asyncio
+import base64
+import json
+import time
 import pytest
 import httpx
 from unittest.mock import AsyncMock, patch, MagicMock
@@ -11,7 +15,23 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
-from service_auth.app.jwks.client import JWKSClient
+from service_auth.app.jwks.client import JWKSClient, JWKS_TIMEOUT
+
+
+def _jwks_response(data=None, status_code=200, headers=None):
+    """Build an httpx response as returned by the JWKS fetch."""
+    return httpx.Response(
+        status_code,
+        json=data,
+        headers=headers,
+        request=httpx.Request("GET", "http://mock-keycloak/jwks")
+    )
+
+
+def _make_token(header):
+    """Build a token string whose header segment encodes the given header."""
+    header_b64 = base64.urlsafe_b64encode(json.dumps(header).encode()).rstrip(b"=").decode()
+    return f"{header_b64}.payload.signature"
 
 
 class TestJWKSClient:
@@ -22,7 +42,7 @@ class TestJWKSClient:
         """Create JWKSClient instance."""
         with patch('service_auth.app.jwks.client.circuit_breaker_manager') as mock_cb_manager:
             mock_circuit_breaker = AsyncMock()
-            mock_cb_manager.get_breaker.return_value = mock_circuit_breaker
+            mock_cb_manager.get_circuit_breaker.return_value = mock_circuit_breaker
             return JWKSClient("http://mock-keycloak/jwks")
     
     @pytest.fixture
@@ -46,6 +66,11 @@ class TestJWKSClient:
         """Mock JWT header."""
         return {"kid": "mock-key-1", "alg": "RS256"}
     
+    @pytest.fixture
+    def mock_token(self, mock_token_header):
+        """Mock JWT carrying the mock header."""
+        return _make_token(mock_token_header)
+    
     @pytest.fixture
     def mock_token_payload(self):
         """Mock JWT payload."""
@@ -62,7 +87,7 @@ class TestJWKSClient:
     async def test_get_jwks_success(self, jwks_client, mock_jwks_data):
         """Test successful JWKS retrieval."""
         # Mock circuit breaker call
-        jwks_client.circuit_breaker.call = AsyncMock(return_value=mock_jwks_data)
+        jwks_client.circuit_breaker.call = AsyncMock(return_value=_jwks_response(mock_jwks_data))
         
         # Test
         result = await jwks_client.get_jwks()
@@ -71,16 +96,17 @@ class TestJWKSClient:
         assert result == mock_jwks_data
         assert jwks_client._jwks_cache == mock_jwks_data
         assert jwks_client._cache_timestamp > 0
+        assert jwks_client._cache_lifetime == jwks_client.cache_ttl
     
     @pytest.mark.asyncio
     async def test_get_jwks_cached(self, jwks_client, mock_jwks_data):
         """Test JWKS retrieval from cache."""
         # Set up cache
         jwks_client._jwks_cache = mock_jwks_data
-        jwks_client._cache_timestamp = datetime.utcnow().timestamp()
+        jwks_client._cache_timestamp = time.monotonic()
         
         # Mock circuit breaker call
-        jwks_client.circuit_breaker.call = AsyncMock(return_value=mock_jwks_data)
+        jwks_client.circuit_breaker.call = AsyncMock(return_value=_jwks_response(mock_jwks_data))
         
         # Test
         result = await jwks_client.get_jwks()
@@ -90,12 +116,48 @@ class TestJWKSClient:
         # Circuit breaker should not be called for cached data
         jwks_client.circuit_breaker.call.assert_not_called()
     
+    @pytest.mark.asyncio
+    async def test_get_jwks_concurrent_refresh_fetches_once(self, jwks_client, mock_jwks_data):
+        """Test concurrent cache misses share a single JWKS fetch."""
+        async def _slow_fetch(func):
+            await asyncio.sleep(0.01)
+            return _jwks_response(mock_jwks_data)
+        
+        jwks_client.circuit_breaker.call = AsyncMock(side_effect=_slow_fetch)
+        
+        # Test
+        results = await asyncio.gather(*(jwks_client.get_jwks() for _ in range(5)))
+        
+        # Assertions
+        assert all(result == mock_jwks_data for result in results)
+        jwks_client.circuit_breaker.call.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_get_jwks_cancelled_caller_does_not_abort_refresh(self, jwks_client, mock_jwks_data):
+        """Test a cancelled caller leaves the shared refresh running for others."""
+        async def _slow_fetch(func):
+            await asyncio.sleep(0.01)
+            return _jwks_response(mock_jwks_data)
+        
+        jwks_client.circuit_breaker.call = AsyncMock(side_effect=_slow_fetch)
+        
+        # Test
+        cancelled = asyncio.create_task(jwks_client.get_jwks())
+        waiting = asyncio.create_task(jwks_client.get_jwks())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        
+        # Assertions
+        assert await waiting == mock_jwks_data
+        jwks_client.circuit_breaker.call.assert_awaited_once()
+        assert jwks_client._refresh_task is None
+    
     @pytest.mark.asyncio
     async def test_get_jwks_failure_with_stale_cache(self, jwks_client, mock_jwks_data):
         """Test JWKS retrieval failure with stale cache fallback."""
         # Set up stale cache
         jwks_client._jwks_cache = mock_jwks_data
-        jwks_client._cache_timestamp = datetime.utcnow().timestamp() - 4000  # Stale
+        jwks_client._cache_timestamp = time.monotonic() - 4000  # Stale
         
         # Mock circuit breaker call to raise exception
         jwks_client.circuit_breaker.call = AsyncMock(side_effect=httpx.HTTPError("Network error"))
@@ -106,6 +168,20 @@ class TestJWKSClient:
         # Assertions
         assert result == mock_jwks_data  # Should return stale cache
     
+    @pytest.mark.asyncio
+    async def test_get_jwks_failure_past_stale_window(self, jwks_client, mock_jwks_data):
+        """Test a stale cache is not served beyond the stale-while-error window."""
+        jwks_client.stale_while_error_ttl = 60
+        jwks_client._jwks_cache = mock_jwks_data
+        jwks_client._cache_timestamp = time.monotonic() - 4000  # Past lifetime + window
+        
+        # Mock circuit breaker call to raise exception
+        jwks_client.circuit_breaker.call = AsyncMock(side_effect=httpx.HTTPError("Network error"))
+        
+        # Test and assert exception
+        with pytest.raises(httpx.HTTPError):
+            await jwks_client.get_jwks()
+    
     @pytest.mark.asyncio
     async def test_get_jwks_failure_no_cache(self, jwks_client):
         """Test JWKS retrieval failure with no cache."""
@@ -116,6 +192,66 @@ class TestJWKSClient:
         with pytest.raises(httpx.HTTPError):
             await jwks_client.get_jwks()
     
+    @pytest.mark.asyncio
+    async def test_preload_populates_cache(self, jwks_client, mock_jwks_data):
+        """Test preload fetches JWKS ahead of the first request."""
+        jwks_client.circuit_breaker.call = AsyncMock(return_value=_jwks_response(mock_jwks_data))
+        
+        # Test
+        await jwks_client.preload()
+        
+        # Assertions
+        assert jwks_client._jwks_cache == mock_jwks_data
+    
+    @pytest.mark.asyncio
+    async def test_preload_failure_is_not_raised(self, jwks_client):
+        """Test preload failures leave the lazy path to fetch later."""
+        jwks_client.circuit_breaker.call = AsyncMock(side_effect=httpx.HTTPError("Network error"))
+        
+        # Test
+        await jwks_client.preload()
+        
+        # Assertions
+        assert jwks_client._jwks_cache is None
+    
+    @pytest.mark.asyncio
+    async def test_background_refresh_before_expiry(self, jwks_client, mock_jwks_data):
+        """Test the background loop refreshes the JWKS ahead of expiry."""
+        jwks_client._jwks_cache = mock_jwks_data
+        jwks_client._cache_timestamp = time.monotonic()
+        jwks_client._cache_lifetime = 0.05
+        jwks_client.circuit_breaker.call = AsyncMock(
+            return_value=_jwks_response(mock_jwks_data, headers={"Cache-Control": "max-age=3600"})
+        )
+        
+        # Test
+        jwks_client.start_background_refresh()
+        await asyncio.sleep(0.1)
+        await jwks_client.stop_background_refresh()
+        
+        # Assertions
+        jwks_client.circuit_breaker.call.assert_awaited_once()
+        assert jwks_client._cache_lifetime == 3600
+        assert jwks_client._background_task is None
+    
+    @pytest.mark.asyncio
+    async def test_background_refresh_retries_after_failure(self, jwks_client, mock_jwks_data):
+        """Test the background loop keeps retrying after a failed refresh."""
+        jwks_client.circuit_breaker.call = AsyncMock(side_effect=[
+            httpx.HTTPError("Network error"),
+            _jwks_response(mock_jwks_data),
+        ])
+        
+        # Test
+        with patch('service_auth.app.jwks.client.REFRESH_BACKOFF_BASE', 0.01):
+            jwks_client.start_background_refresh()
+            await asyncio.sleep(0.1)
+            await jwks_client.stop_background_refresh()
+        
+        # Assertions
+        assert jwks_client.circuit_breaker.call.await_count == 2
+        assert jwks_client._jwks_cache == mock_jwks_data
+    
     @pytest.mark.asyncio
     async def test_get_key_success(self, jwks_client, mock_jwks_data):
         """Test successful key retrieval."""
@@ -127,24 +263,34 @@ class TestJWKSClient:
         
         # Assertions
         assert result == mock_jwks_data["keys"][0]
-        assert "mock-key-1" in jwks_client._key_cache
+        assert "mock-key-1" in jwks_client._kid_index
     
     @pytest.mark.asyncio
-    async def test_get_key_cached(self, jwks_client, mock_jwks_data):
-        """Test key retrieval from cache."""
-        # Set up key cache
-        jwks_client._key_cache["mock-key-1"] = mock_jwks_data["keys"][0]
-        
+    async def test_get_key_reuses_index(self, jwks_client, mock_jwks_data):
+        """Test key lookups reuse the kid index while the JWKS is unchanged."""
         # Mock get_jwks
         jwks_client.get_jwks = AsyncMock(return_value=mock_jwks_data)
         
         # Test
+        await jwks_client.get_key("mock-key-1")
+        index = jwks_client._kid_index
         result = await jwks_client.get_key("mock-key-1")
         
         # Assertions
         assert result == mock_jwks_data["keys"][0]
-        # get_jwks should not be called for cached key
-        jwks_client.get_jwks.assert_not_called()
+        assert jwks_client._kid_index is index
+    
+    @pytest.mark.asyncio
+    async def test_get_key_rebuilds_index_after_refresh(self, jwks_client, mock_jwks_data):
+        """Test the kid index follows a rotated JWKS."""
+        rotated = {"keys": [{"kty": "RSA", "kid": "mock-key-2", "n": "n", "e": "AQAB"}]}
+        jwks_client.get_jwks = AsyncMock(side_effect=[mock_jwks_data, rotated])
+        
+        # Test
+        assert await jwks_client.get_key("mock-key-1") is not None
+        
+        # Assertions
+        assert await jwks_client.get_key("mock-key-1") is None
     
     @pytest.mark.asyncio
     async def test_get_key_not_found(self, jwks_client, mock_jwks_data):
@@ -159,80 +305,147 @@ class TestJWKSClient:
         assert result is None
     
     @pytest.mark.asyncio
-    async def test_verify_token_success(self, jwks_client, mock_jwks_data, mock_token_header, mock_token_payload):
+    async def test_verify_token_success(self, jwks_client, mock_jwks_data, mock_token, mock_token_payload):
         """Test successful token verification."""
         # Mock get_key
         jwks_client.get_key = AsyncMock(return_value=mock_jwks_data["keys"][0])
         
         # Mock JWT operations
         with patch('service_auth.app.jwks.client.jwt') as mock_jwt:
-            mock_jwt.get_unverified_header.return_value = mock_token_header
             mock_jwt.decode.return_value = mock_token_payload
             
-            # Mock jwk.construct
-            with patch('service_auth.app.jwks.client.jwk') as mock_jwk:
+            # Mock RSAAlgorithm.from_jwk
+            with patch('service_auth.app.jwks.client.RSAAlgorithm') as mock_rsa_algorithm:
                 mock_rsa_key = MagicMock()
-                mock_jwk.construct.return_value = mock_rsa_key
+                mock_rsa_algorithm.from_jwk.return_value = mock_rsa_key
                 
                 # Test
-                result = await jwks_client.verify_token("valid_token")
+                result = await jwks_client.verify_token(mock_token)
                 
                 # Assertions
                 assert result == mock_token_payload
-                mock_jwt.get_unverified_header.assert_called_once_with("valid_token")
+                jwks_client.get_key.assert_awaited_once_with("mock-key-1")
                 mock_jwt.decode.assert_called_once()
     
     @pytest.mark.asyncio
-    async def test_verify_token_missing_kid(self, jwks_client):
-        """Test token verification with missing key ID."""
+    async def test_verify_token_reuses_constructed_key(self, jwks_client, mock_jwks_data, mock_token, mock_token_payload):
+        """Test the RSA key is constructed once per kid."""
+        jwks_client.get_jwks = AsyncMock(return_value=mock_jwks_data)
+        
         # Mock JWT operations
         with patch('service_auth.app.jwks.client.jwt') as mock_jwt:
-            mock_jwt.get_unverified_header.return_value = {"alg": "RS256"}  # Missing kid
+            mock_jwt.decode.return_value = mock_token_payload
             
-            # Test and assert exception
-            with pytest.raises(Exception):  # JWTError
-                await jwks_client.verify_token("invalid_token")
+            with patch('service_auth.app.jwks.client.RSAAlgorithm') as mock_rsa_algorithm:
+                mock_rsa_algorithm.from_jwk.return_value = MagicMock()
+                
+                # Test
+                await jwks_client.verify_token(mock_token)
+                await jwks_client.verify_token(mock_token)
+                
+                # Assertions
+                mock_rsa_algorithm.from_jwk.assert_called_once_with(mock_jwks_data["keys"][0])
+                assert "mock-key-1" in jwks_client._rsa_key_cache
+    
+    @pytest.mark.asyncio
+    async def test_refresh_preconstructs_keys(self, jwks_client, mock_jwks_data):
+        """Test a JWKS refresh indexes and constructs keys before any request needs them."""
+        jwks_client.circuit_breaker.call = AsyncMock(return_value=_jwks_response(mock_jwks_data))
+        
+        with patch('service_auth.app.jwks.client.RSAAlgorithm') as mock_rsa_algorithm:
+            mock_rsa_key = MagicMock()
+            mock_rsa_algorithm.from_jwk.return_value = mock_rsa_key
+            
+            # Test
+            await jwks_client.get_jwks()
+            
+            # Assertions
+            assert "mock-key-1" in jwks_client._kid_index
+            assert jwks_client._rsa_key_cache == {"mock-key-1": mock_rsa_key}
     
     @pytest.mark.asyncio
-    async def test_verify_token_key_not_found(self, jwks_client, mock_token_header):
+    async def test_rsa_key_cache_dropped_on_jwks_change(self, jwks_client, mock_jwks_data):
+        """Test constructed keys are discarded when a different JWKS is served."""
+        rotated = {"keys": [{"kty": "RSA", "kid": "mock-key-1", "n": "n2", "e": "AQAB"}]}
+        jwks_client.get_jwks = AsyncMock(side_effect=[mock_jwks_data, rotated])
+        
+        # Test
+        await jwks_client.get_key("mock-key-1")
+        jwks_client._rsa_key_cache["mock-key-1"] = MagicMock()
+        await jwks_client.get_key("mock-key-1")
+        
+        # Assertions
+        assert jwks_client._rsa_key_cache == {}
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_missing_kid(self, jwks_client):
+        """Test token verification with missing key ID."""
+        jwks_client.get_key = AsyncMock()
+        
+        # Test and assert exception
+        with pytest.raises(Exception):  # InvalidTokenError
+            await jwks_client.verify_token(_make_token({"alg": "RS256"}))  # Missing kid
+        
+        jwks_client.get_key.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_unsupported_algorithm(self, jwks_client):
+        """Test tokens not signed with RS256 are rejected before key lookup."""
+        jwks_client.get_key = AsyncMock()
+        
+        # Test and assert exception
+        with pytest.raises(Exception):  # InvalidTokenError
+            await jwks_client.verify_token(_make_token({"kid": "mock-key-1", "alg": "HS256"}))
+        
+        jwks_client.get_key.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_malformed_header(self, jwks_client):
+        """Test token verification with an undecodable header segment."""
+        jwks_client.get_key = AsyncMock()
+        
+        # Test and assert exception
+        with pytest.raises(Exception):  # InvalidTokenError
+            await jwks_client.verify_token("not-a-jwt!")
+        
+        jwks_client.get_key.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_key_not_found(self, jwks_client, mock_token):
         """Test token verification with key not found."""
         # Mock get_key to return None
         jwks_client.get_key = AsyncMock(return_value=None)
         
-        # Mock JWT operations
-        with patch('service_auth.app.jwks.client.jwt') as mock_jwt:
-            mock_jwt.get_unverified_header.return_value = mock_token_header
-            
-            # Test and assert exception
-            with pytest.raises(Exception):  # JWTError
-                await jwks_client.verify_token("invalid_token")
+        # Test and assert exception
+        with pytest.raises(Exception):  # InvalidTokenError
+            await jwks_client.verify_token(mock_token)
     
     @pytest.mark.asyncio
-    async def test_verify_token_decode_error(self, jwks_client, mock_jwks_data, mock_token_header):
+    async def test_verify_token_decode_error(self, jwks_client, mock_jwks_data, mock_token):
         """Test token verification with decode error."""
         # Mock get_key
         jwks_client.get_key = AsyncMock(return_value=mock_jwks_data["keys"][0])
         
         # Mock JWT operations
         with patch('service_auth.app.jwks.client.jwt') as mock_jwt:
-            mock_jwt.get_unverified_header.return_value = mock_token_header
             mock_jwt.decode.side_effect = Exception("Invalid token")
             
-            # Mock jwk.construct
-            with patch('service_auth.app.jwks.client.jwk') as mock_jwk:
+            # Mock RSAAlgorithm.from_jwk
+            with patch('service_auth.app.jwks.client.RSAAlgorithm') as mock_rsa_algorithm:
                 mock_rsa_key = MagicMock()
-                mock_jwk.construct.return_value = mock_rsa_key
+                mock_rsa_algorithm.from_jwk.return_value = mock_rsa_key
                 
                 # Test and assert exception
                 with pytest.raises(Exception):
-                    await jwks_client.verify_token("invalid_token")
+                    await jwks_client.verify_token(mock_token)
     
     def test_clear_cache(self, jwks_client, mock_jwks_data):
         """Test cache clearing."""
         # Set up cache
         jwks_client._jwks_cache = mock_jwks_data
-        jwks_client._cache_timestamp = datetime.utcnow().timestamp()
-        jwks_client._key_cache["mock-key-1"] = mock_jwks_data["keys"][0]
+        jwks_client._cache_timestamp = time.monotonic()
+        jwks_client._kid_index["mock-key-1"] = mock_jwks_data["keys"][0]
+        jwks_client._rsa_key_cache["mock-key-1"] = MagicMock()
         
         # Test
         jwks_client.clear_cache()
@@ -240,4 +453,101 @@ class TestJWKSClient:
         # Assertions
         assert jwks_client._jwks_cache is None
         assert jwks_client._cache_timestamp == 0
-        assert len(jwks_client._key_cache) == 0
+        assert jwks_client._etag is None
+        assert len(jwks_client._kid_index) == 0
+        assert len(jwks_client._rsa_key_cache) == 0
+    
+    @pytest.mark.asyncio
+    async def test_fetch_reuses_shared_http_client(self, jwks_client, mock_jwks_data):
+        """Test JWKS fetches go through the long-lived HTTP client."""
+        jwks_client._client.get = AsyncMock(return_value=_jwks_response(mock_jwks_data))
+        
+        async def _call(func):
+            return await func()
+        
+        jwks_client.circuit_breaker.call = _call
+        
+        # Test
+        result = await jwks_client.get_jwks()
+        
+        # Assertions
+        assert result == mock_jwks_data
+        jwks_client._client.get.assert_awaited_once_with(
+            "http://mock-keycloak/jwks",
+            headers={"Accept": "application/json"},
+            timeout=JWKS_TIMEOUT
+        )
+    
+    @pytest.mark.asyncio
+    async def test_revalidation_not_modified(self, jwks_client, mock_jwks_data):
+        """Test a 304 revalidation keeps the cached JWKS and renews its lifetime."""
+        jwks_client._client.get = AsyncMock(side_effect=[
+            _jwks_response(mock_jwks_data, headers={"ETag": '"v1"', "Cache-Control": "max-age=600"}),
+            _jwks_response(status_code=304, headers={"Cache-Control": "max-age=900"}),
+        ])
+        
+        async def _call(func):
+            return await func()
+        
+        jwks_client.circuit_breaker.call = _call
+        
+        # Test
+        await jwks_client.get_jwks()
+        assert jwks_client._cache_lifetime == 600
+        jwks_client._cache_timestamp -= 601  # Expire the cache
+        result = await jwks_client.get_jwks()
+        
+        # Assertions
+        assert result is jwks_client._jwks_cache
+        assert result == mock_jwks_data
+        assert jwks_client._cache_lifetime == 900
+        jwks_client._client.get.assert_awaited_with(
+            "http://mock-keycloak/jwks",
+            headers={"Accept": "application/json", "If-None-Match": '"v1"'},
+            timeout=JWKS_TIMEOUT
+        )
+    
+    @pytest.mark.parametrize("headers, expected", [
+        ({}, 3600),
+        ({"Cache-Control": "public, max-age=300"}, 300),
+        ({"Cache-Control": "max-age=86400"}, 3600),
+        ({"Cache-Control": "no-cache"}, 60),
+        ({"Date": "Mon, 01 Jan 2024 00:00:00 GMT", "Expires": "Mon, 01 Jan 2024 00:10:00 GMT"}, 600),
+        ({"Expires": "0"}, 60),
+    ])
+    def test_freshness_lifetime(self, jwks_client, headers, expected):
+        """Test the cache lifetime derived from response caching headers."""
+        lifetime = jwks_client._freshness_lifetime(httpx.Headers(headers))
+        
+        assert lifetime == expected
+    
+    @pytest.mark.asyncio
+    async def test_shared_http_client_left_open(self):
+        """Test a caller-supplied HTTP client is used but not closed."""
+        shared_client = httpx.AsyncClient()
+        with patch('service_auth.app.jwks.client.circuit_breaker_manager'):
+            client = JWKSClient("http://mock-keycloak/jwks", http_client=shared_client)
+        
+        # Test
+        await client.close()
+        
+        # Assertions
+        assert client._client is shared_client
+        assert not shared_client.is_closed
+        await shared_client.aclose()
+    
+    def test_circuit_breaker_shared_per_url(self):
+        """Test clients for the same JWKS URL share one circuit breaker."""
+        first = JWKSClient("http://shared-keycloak/jwks")
+        second = JWKSClient("http://shared-keycloak/jwks")
+        other = JWKSClient("http://other-keycloak/jwks")
+        
+        assert first.circuit_breaker is second.circuit_breaker
+        assert first.circuit_breaker is not other.circuit_breaker
+    
+    @pytest.mark.asyncio
+    async def test_close(self, jwks_client):
+        """Test closing the HTTP client."""
+        await jwks_client.close()
+        
+        assert jwks_client._client.is_closed
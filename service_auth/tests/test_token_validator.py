@@ -2,6 +2,7 @@
 Unit tests for TokenValidator.
 """
 
+import asyncio
 import pytest
 import jwt
 from datetime import datetime, timedelta
@@ -13,6 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 from service_auth.app.validation.token_validator import TokenValidator, TokenVerificationRequest, TokenVerificationResponse, TokenRefreshResponse
 from shared.errors import AuthenticationError
+from pydantic import ValidationError
 
 
 class TestTokenValidator:
@@ -93,6 +95,49 @@ class TestTokenValidator:
         assert result.claims is None
         assert "Invalid token" in result.error
     
+    @pytest.mark.asyncio
+    async def test_verify_token_cached(self, token_validator, mock_claims):
+        """Test repeat verifications of a token are served from the cache."""
+        # Mock JWKS client
+        token_validator.jwks_client.verify_token = AsyncMock(return_value=mock_claims)
+        
+        # Test
+        await token_validator.verify_token("valid_token")
+        result = await token_validator.verify_token("Bearer valid_token")
+        
+        # Assertions
+        assert result.valid is True
+        assert result.claims == mock_claims
+        token_validator.jwks_client.verify_token.assert_called_once_with("valid_token")
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_expired_claims_not_cached(self, token_validator, mock_claims):
+        """Test claims past their exp are not cached."""
+        mock_claims["exp"] = int((datetime.utcnow() - timedelta(seconds=5)).timestamp())
+        token_validator.jwks_client.verify_token = AsyncMock(return_value=mock_claims)
+        
+        # Test
+        await token_validator.verify_token("valid_token")
+        await token_validator.verify_token("valid_token")
+        
+        # Assertions
+        assert token_validator.jwks_client.verify_token.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_verify_token_failure_not_cached(self, token_validator, mock_claims):
+        """Test failed verifications are retried rather than cached."""
+        token_validator.jwks_client.verify_token = AsyncMock(
+            side_effect=[jwt.InvalidTokenError("Invalid token"), mock_claims]
+        )
+        
+        # Test
+        first = await token_validator.verify_token("valid_token")
+        second = await token_validator.verify_token("valid_token")
+        
+        # Assertions
+        assert first.valid is False
+        assert second.valid is True
+    
     @pytest.mark.asyncio
     async def test_extract_claims_success(self, token_validator, mock_claims):
         """Test successful claims extraction."""
@@ -132,6 +177,35 @@ class TestTokenValidator:
         assert user_info["roles"] == ["user", "analyst"]
         assert user_info["client_roles"] == {"access-layer": {"roles": ["user"]}}
     
+    @pytest.mark.asyncio
+    async def test_verify_and_extract(self, token_validator, mock_claims):
+        """Test verification and user info extraction share one verification."""
+        # Mock JWKS client
+        token_validator.jwks_client.verify_token = AsyncMock(return_value=mock_claims)
+        
+        # Test
+        response, user_info = await token_validator.verify_and_extract("valid_token")
+        
+        # Assertions
+        assert response.valid is True
+        assert response.claims == mock_claims
+        assert user_info["user_id"] == "user1"
+        assert user_info["roles"] == ["user", "analyst"]
+        token_validator.jwks_client.verify_token.assert_called_once_with("valid_token")
+    
+    @pytest.mark.asyncio
+    async def test_verify_and_extract_invalid(self, token_validator):
+        """Test verify_and_extract returns no user info for invalid tokens."""
+        # Mock JWKS client to raise exception
+        token_validator.jwks_client.verify_token = AsyncMock(side_effect=jwt.InvalidTokenError("Invalid token"))
+        
+        # Test
+        response, user_info = await token_validator.verify_and_extract("invalid_token")
+        
+        # Assertions
+        assert response.valid is False
+        assert user_info is None
+    
     @pytest.mark.asyncio
     async def test_refresh_token_success(self, token_validator, mock_refresh_claims):
         """Test successful token refresh."""
@@ -180,6 +254,25 @@ class TestTokenValidator:
         assert result.valid is False
         assert "Invalid refresh token type" in result.error
     
+    @pytest.mark.asyncio
+    async def test_refresh_token_failure_response_reused(self, token_validator):
+        """Test fixed-message refresh failures share one prebuilt response."""
+        token_validator.jwks_client.verify_token = AsyncMock(return_value={"sub": "user1", "typ": "Access"})
+        
+        # Test
+        first = await token_validator.refresh_token("invalid_refresh_token")
+        second = await token_validator.refresh_token("invalid_refresh_token")
+        
+        # Assertions
+        assert first is second
+    
+    def test_response_models_frozen(self):
+        """Test verification responses cannot be mutated once built."""
+        response = TokenVerificationResponse(valid=False, error="Token revoked")
+        
+        with pytest.raises(ValidationError):
+            response.valid = True
+    
     @pytest.mark.asyncio
     async def test_refresh_token_missing_user_id(self, token_validator):
         """Test refresh token missing user ID."""
@@ -222,6 +315,34 @@ class TestTokenValidator:
         # Assertions
         assert result is True
     
+    @pytest.mark.asyncio
+    async def test_revoked_token_rejected(self, token_validator, mock_claims):
+        """Test a revoked token no longer verifies, even with cached claims."""
+        token_validator.jwks_client.verify_token = AsyncMock(return_value=mock_claims)
+        
+        # Test
+        assert (await token_validator.verify_token("valid_token")).valid is True
+        assert await token_validator.revoke_token("Bearer valid_token") is True
+        result = await token_validator.verify_token("valid_token")
+        
+        # Assertions
+        assert result.valid is False
+        assert result.error == "Token revoked"
+        token_validator.jwks_client.verify_token.assert_called_once_with("valid_token")
+    
+    @pytest.mark.asyncio
+    async def test_revoked_refresh_token_rejected(self, token_validator, mock_refresh_claims):
+        """Test a revoked token cannot be used to refresh."""
+        token_validator.jwks_client.verify_token = AsyncMock(return_value=mock_refresh_claims)
+        await token_validator.revoke_token("valid_refresh_token")
+        
+        # Test
+        result = await token_validator.refresh_token("valid_refresh_token")
+        
+        # Assertions
+        assert result.valid is False
+        assert result.error == "Token revoked"
+    
     @pytest.mark.asyncio
     async def test_revoke_token_failure(self, token_validator):
         """Test token revocation failure."""
@@ -257,6 +378,47 @@ class TestTokenValidator:
         # Assertions
         assert user_info is None
     
+    @pytest.mark.asyncio
+    async def test_fetch_user_by_id_reuses_rows(self, token_validator):
+        """Test user rows come from the shared mock table rather than per-call copies."""
+        # Test
+        first = await token_validator._fetch_user_by_id("user1")
+        second = await token_validator._fetch_user_by_id("user1")
+        
+        # Assertions
+        assert first is second
+        assert first["username"] == "john.doe"
+    
+    @pytest.mark.asyncio
+    async def test_get_user_by_id_cached(self, token_validator):
+        """Test repeat user lookups are served from the cache."""
+        token_validator._fetch_user_by_id = AsyncMock(return_value={"id": "user1"})
+        
+        # Test
+        await token_validator.get_user_by_id("user1")
+        user_info = await token_validator.get_user_by_id("user1")
+        
+        # Assertions
+        assert user_info == {"id": "user1"}
+        token_validator._fetch_user_by_id.assert_awaited_once_with("user1")
+    
+    @pytest.mark.asyncio
+    async def test_get_user_by_id_concurrent_fetches_once(self, token_validator):
+        """Test concurrent lookups for one user share a single fetch."""
+        async def _slow_fetch(user_id):
+            await asyncio.sleep(0.01)
+            return {"id": user_id}
+        
+        token_validator._fetch_user_by_id = AsyncMock(side_effect=_slow_fetch)
+        
+        # Test
+        results = await asyncio.gather(*(token_validator.get_user_by_id("user1") for _ in range(5)))
+        
+        # Assertions
+        assert all(result == {"id": "user1"} for result in results)
+        token_validator._fetch_user_by_id.assert_awaited_once()
+        assert token_validator._user_inflight == {}
+    
     @pytest.mark.asyncio
     async def test_generate_new_tokens(self, token_validator):
         """Test new token generation."""
@@ -279,3 +441,4 @@ class TestTokenValidator:
         assert tokens["expires_in"] == 3600
         assert tokens["access_token"].startswith("mock_access_token_")
         assert tokens["refresh_token"].startswith("mock_refresh_token_")
+        assert tokens["access_token"].rsplit("_", 1)[1] == tokens["refresh_token"].rsplit("_", 1)[1]
@@ -46,7 +46,12 @@ class EntitlementsService(BaseService):
         
         # Initialize components
         self.rule_engine = RuleEngine()
-        self.persistence = PostgreSQLPersistence(self.config.postgres_dsn)
+        self.persistence = PostgreSQLPersistence(
+            self.config.postgres_dsn,
+            min_size=self.config.postgres_pool_min_size,
+            max_size=self.config.postgres_pool_max_size,
+            statement_cache_size=self.config.postgres_statement_cache_size
+        )
         self.cache = RedisCache(self.config.redis_url)
         
         self._setup_entitlements_routes()
@@ -1,9 +1,17 @@
 """
 PostgreSQL persistence layer for Entitlements Service.
+
+Pool size is per process; keep max_size times the replica count under the
+server's max_connections. With many replicas, front Postgres with PgBouncer
+or PgDoorman in transaction pooling mode and set statement_cache_size to 0,
+since server-side prepared statements do not follow a client across pooled
+server connections.
 """
 
 import asyncio
-from typing import Dict, Any, Optional, List
+import time
+import orjson
+from typing import Dict, Any, Optional, List, Set, Tuple
 from datetime import datetime
 import sys
 import os
@@ -16,23 +24,160 @@ from shared.logging import get_logger
 from shared.errors import AccessLayerException
 from ..rules.models import Rule, RuleCondition, RuleConditionOperator, RuleAction, RuleResource
 
+# Rule stats are a full-table aggregate; reuse them for this many seconds
+RULE_STATS_TTL = 5.0
+
+# Value -> member maps, cheaper per row than calling the enum classes
+_RESOURCES = {member.value: member for member in RuleResource}
+_ACTIONS = {member.value: member for member in RuleAction}
+_OPERATORS = {member.value: member for member in RuleConditionOperator}
+
+# Batches at least this large are staged with COPY instead of executemany
+BULK_COPY_THRESHOLD = 500
+
+_RULE_COLUMNS = (
+    "rule_id", "name", "description", "resource", "action", "conditions",
+    "priority", "enabled", "tenant_id", "user_id", "created_at", "updated_at", "expires_at"
+)
+
+_UPSERT_RULE_SET = """
+    ON CONFLICT (rule_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        resource = EXCLUDED.resource,
+        action = EXCLUDED.action,
+        conditions = EXCLUDED.conditions,
+        priority = EXCLUDED.priority,
+        enabled = EXCLUDED.enabled,
+        tenant_id = EXCLUDED.tenant_id,
+        user_id = EXCLUDED.user_id,
+        updated_at = EXCLUDED.updated_at,
+        expires_at = EXCLUDED.expires_at
+"""
+
+_UPSERT_RULE_SQL = f"""
+    INSERT INTO rules ({", ".join(_RULE_COLUMNS)})
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+    {_UPSERT_RULE_SET}
+"""
+
+_MERGE_STAGED_RULES_SQL = f"""
+    INSERT INTO rules ({", ".join(_RULE_COLUMNS)})
+    SELECT {", ".join(_RULE_COLUMNS)} FROM rules_stage
+    {_UPSERT_RULE_SET}
+"""
+
+
+# Query texts are fixed so each maps to one entry in asyncpg's per-connection
+# prepared statement cache, which survives pool release (PreparedStatement
+# objects do not)
+_SELECT_RULES = f"SELECT {', '.join(_RULE_COLUMNS)} FROM rules"
+
+_LOAD_RULE_SQL = f"{_SELECT_RULES} WHERE rule_id = $1"
+
+_LOAD_ALL_RULES_SQL = f"{_SELECT_RULES} ORDER BY priority DESC, created_at ASC"
+
+_LOAD_RULES_FOR_RESOURCE_SQL = f"""
+    {_SELECT_RULES}
+    WHERE resource = $1 AND enabled = TRUE
+    ORDER BY priority DESC, created_at ASC
+"""
+
+_LOAD_RULES_FOR_TENANT_SQL = f"""
+    {_SELECT_RULES}
+    WHERE tenant_id = $1
+    ORDER BY priority DESC, created_at ASC
+"""
+
+# Containment (@>) is the JSONB operator the conditions GIN index accelerates
+_LOAD_RULES_MATCHING_FIELD_SQL = f"""
+    {_SELECT_RULES}
+    WHERE enabled = TRUE AND conditions @> $1::jsonb
+    ORDER BY priority DESC, created_at ASC
+"""
+
+_DELETE_RULE_SQL = "DELETE FROM rules WHERE rule_id = $1 RETURNING rule_id"
+
+_DELETE_RULES_SQL = "DELETE FROM rules WHERE rule_id = ANY($1::text[]) RETURNING rule_id"
+
+_RULE_STATS_SQL = """
+    SELECT
+        COUNT(*) as total_rules,
+        COUNT(*) FILTER (WHERE enabled = TRUE) as enabled_rules,
+        COUNT(*) FILTER (WHERE tenant_id IS NOT NULL) as tenant_rules,
+        COUNT(*) FILTER (WHERE user_id IS NOT NULL) as user_rules,
+        COUNT(DISTINCT resource) as unique_resources,
+        COUNT(DISTINCT tenant_id) as unique_tenants
+    FROM rules
+"""
+
+
+def _encode_jsonb(text: str) -> bytes:
+    """Encode JSON text in jsonb's binary wire format (version byte + text)."""
+    return b"\x01" + text.encode()
+
+
+def _decode_jsonb(data: bytes) -> Any:
+    """Decode a binary jsonb value with orjson."""
+    return orjson.loads(data[1:])
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Register the orjson-backed jsonb codec on a new pool connection."""
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary"
+    )
+
+
+def _rule_record(rule: Rule) -> tuple:
+    """Build the positional upsert parameters for a rule, in _RULE_COLUMNS order."""
+    # orjson serializes the RuleCondition dataclasses and enums directly, with no
+    # intermediate dict per condition; jsonb parameters are passed as JSON text
+    # and read back through the orjson codec registered in _init_connection
+    conditions_json = orjson.dumps(rule.conditions).decode()
+    return (
+        rule.rule_id, rule.name, rule.description, rule.resource.value,
+        rule.action.value, conditions_json, rule.priority, rule.enabled,
+        rule.tenant_id, rule.user_id, rule.created_at, rule.updated_at, rule.expires_at
+    )
+
 
 class PostgreSQLPersistence:
     """PostgreSQL persistence layer for rules."""
     
-    def __init__(self, dsn: str):
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        statement_cache_size: int = 1024
+    ):
         self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
         self.logger = get_logger("entitlements.persistence.postgres")
         self.pool: Optional[asyncpg.Pool] = None
+        
+        # (monotonic fetch time, stats) of the last rule stats query; writes clear it
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
     
     async def start(self):
         """Start the persistence layer."""
         try:
             self.pool = await asyncpg.create_pool(
                 self.dsn,
-                min_size=2,
-                max_size=10,
-                command_timeout=30
+                min_size=self.min_size,
+                max_size=self.max_size,
+                command_timeout=30,
+                statement_cache_size=self.statement_cache_size,
+                max_queries=50_000,
+                max_inactive_connection_lifetime=300,
+                init=_init_connection
             )
             
             # Create tables if they don't exist
@@ -71,61 +216,37 @@ class PostgreSQLPersistence:
                 );
             """)
             
-            # Create indexes
+            # Create indexes; the composite ones match the loaders' filter and
+            # ORDER BY so rules come back in index order with no sort step
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rules_resource ON rules(resource);
+                CREATE INDEX IF NOT EXISTS idx_rules_resource_enabled_prio
+                ON rules(resource, priority DESC, created_at) WHERE enabled = TRUE;
             """)
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rules_tenant ON rules(tenant_id);
+                CREATE INDEX IF NOT EXISTS idx_rules_tenant_prio
+                ON rules(tenant_id, priority DESC, created_at);
             """)
             await conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_rules_user ON rules(user_id);
             """)
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rules_enabled ON rules(enabled);
+                CREATE INDEX IF NOT EXISTS idx_rules_conditions_gin
+                ON rules USING GIN (conditions jsonb_path_ops);
             """)
+            
+            # Single-column indexes superseded by the composite ones above
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_rules_priority ON rules(priority DESC);
+                DROP INDEX IF EXISTS idx_rules_resource, idx_rules_tenant,
+                    idx_rules_enabled, idx_rules_priority;
             """)
     
     async def save_rule(self, rule: Rule) -> bool:
         """Save a rule to the database."""
         try:
             async with self.pool.acquire() as conn:
-                # Serialize conditions
-                conditions_json = [
-                    {
-                        "field": c.field,
-                        "operator": c.operator.value,
-                        "value": c.value,
-                        "description": c.description
-                    }
-                    for c in rule.conditions
-                ]
-                
-                await conn.execute("""
-                    INSERT INTO rules (
-                        rule_id, name, description, resource, action, conditions,
-                        priority, enabled, tenant_id, user_id, created_at, updated_at, expires_at
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
-                    ON CONFLICT (rule_id) DO UPDATE SET
-                        name = EXCLUDED.name,
-                        description = EXCLUDED.description,
-                        resource = EXCLUDED.resource,
-                        action = EXCLUDED.action,
-                        conditions = EXCLUDED.conditions,
-                        priority = EXCLUDED.priority,
-                        enabled = EXCLUDED.enabled,
-                        tenant_id = EXCLUDED.tenant_id,
-                        user_id = EXCLUDED.user_id,
-                        updated_at = EXCLUDED.updated_at,
-                        expires_at = EXCLUDED.expires_at
-                """, 
-                    rule.rule_id, rule.name, rule.description, rule.resource.value,
-                    rule.action.value, conditions_json, rule.priority, rule.enabled,
-                    rule.tenant_id, rule.user_id, rule.created_at, rule.updated_at, rule.expires_at
-                )
+                await conn.execute(_UPSERT_RULE_SQL, *_rule_record(rule))
                 
+                self._stats_cache = None
                 self.logger.info("Rule saved", rule_id=rule.rule_id, name=rule.name)
                 return True
                 
@@ -133,13 +254,42 @@ class PostgreSQLPersistence:
             self.logger.error("Error saving rule", rule_id=rule.rule_id, error=str(e))
             return False
     
+    async def save_rules(self, rules: List[Rule]) -> bool:
+        """Save many rules in one transaction, staging large batches with COPY."""
+        if not rules:
+            return True
+        
+        # Last write wins for repeated rule IDs, as with sequential save_rule calls
+        records = list({rule.rule_id: _rule_record(rule) for rule in rules}.values())
+        
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    if len(records) < BULK_COPY_THRESHOLD:
+                        await conn.executemany(_UPSERT_RULE_SQL, records)
+                    else:
+                        await conn.execute("""
+                            CREATE TEMP TABLE rules_stage (LIKE rules INCLUDING DEFAULTS)
+                            ON COMMIT DROP
+                        """)
+                        await conn.copy_records_to_table(
+                            "rules_stage", records=records, columns=_RULE_COLUMNS
+                        )
+                        await conn.execute(_MERGE_STAGED_RULES_SQL)
+                
+                self._stats_cache = None
+                self.logger.info("Rules saved", count=len(records))
+                return True
+                
+        except Exception as e:
+            self.logger.error("Error saving rules", count=len(records), error=str(e))
+            return False
+    
     async def load_rule(self, rule_id: str) -> Optional[Rule]:
         """Load a rule from the database."""
         try:
             async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("""
-                    SELECT * FROM rules WHERE rule_id = $1
-                """, rule_id)
+                row = await conn.fetchrow(_LOAD_RULE_SQL, rule_id)
                 
                 if not row:
                     return None
@@ -154,9 +304,7 @@ class PostgreSQLPersistence:
         """Load all rules from the database."""
         try:
             async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT * FROM rules ORDER BY priority DESC, created_at ASC
-                """)
+                rows = await conn.fetch(_LOAD_ALL_RULES_SQL)
                 
                 return [self._row_to_rule(row) for row in rows]
                 
@@ -168,11 +316,7 @@ class PostgreSQLPersistence:
         """Load rules for a specific resource."""
         try:
             async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT * FROM rules 
-                    WHERE resource = $1 AND enabled = TRUE
-                    ORDER BY priority DESC, created_at ASC
-                """, resource)
+                rows = await conn.fetch(_LOAD_RULES_FOR_RESOURCE_SQL, resource)
                 
                 return [self._row_to_rule(row) for row in rows]
                 
@@ -184,11 +328,7 @@ class PostgreSQLPersistence:
         """Load rules for a specific tenant."""
         try:
             async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT * FROM rules 
-                    WHERE tenant_id = $1
-                    ORDER BY priority DESC, created_at ASC
-                """, tenant_id)
+                rows = await conn.fetch(_LOAD_RULES_FOR_TENANT_SQL, tenant_id)
                 
                 return [self._row_to_rule(row) for row in rows]
                 
@@ -196,15 +336,28 @@ class PostgreSQLPersistence:
             self.logger.error("Error loading rules for tenant", tenant_id=tenant_id, error=str(e))
             return []
     
+    async def load_rules_matching_field(self, field: str) -> List[Rule]:
+        """Load enabled rules with a condition on the given context field."""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    _LOAD_RULES_MATCHING_FIELD_SQL, orjson.dumps([{"field": field}]).decode()
+                )
+                
+                return [self._row_to_rule(row) for row in rows]
+                
+        except Exception as e:
+            self.logger.error("Error loading rules matching field", field=field, error=str(e))
+            return []
+    
     async def delete_rule(self, rule_id: str) -> bool:
         """Delete a rule from the database."""
         try:
             async with self.pool.acquire() as conn:
-                result = await conn.execute("""
-                    DELETE FROM rules WHERE rule_id = $1
-                """, rule_id)
+                deleted = await conn.fetchval(_DELETE_RULE_SQL, rule_id)
                 
-                if result == "DELETE 1":
+                if deleted is not None:
+                    self._stats_cache = None
                     self.logger.info("Rule deleted", rule_id=rule_id)
                     return True
                 else:
@@ -215,32 +368,42 @@ class PostgreSQLPersistence:
             self.logger.error("Error deleting rule", rule_id=rule_id, error=str(e))
             return False
     
-    async def get_rule_count(self) -> int:
-        """Get total number of rules."""
+    async def delete_rules(self, rule_ids: List[str]) -> Set[str]:
+        """Delete many rules in one statement, returning the IDs that existed."""
+        if not rule_ids:
+            return set()
+        
         try:
             async with self.pool.acquire() as conn:
-                count = await conn.fetchval("SELECT COUNT(*) FROM rules")
-                return count or 0
+                rows = await conn.fetch(_DELETE_RULES_SQL, list(rule_ids))
+                
+                deleted = {row[0] for row in rows}
+                if deleted:
+                    self._stats_cache = None
+                self.logger.info("Rules deleted", requested=len(rule_ids), deleted=len(deleted))
+                return deleted
+                
         except Exception as e:
-            self.logger.error("Error getting rule count", error=str(e))
-            return 0
+            self.logger.error("Error deleting rules", count=len(rule_ids), error=str(e))
+            return set()
+    
+    async def get_rule_count(self) -> int:
+        """Get total number of rules."""
+        stats = await self.get_rule_stats()
+        return stats.get("total_rules", 0)
     
     async def get_rule_stats(self) -> Dict[str, Any]:
-        """Get rule statistics."""
+        """Get rule statistics, cached for RULE_STATS_TTL seconds."""
+        cached = self._stats_cache
+        if cached is not None and time.monotonic() - cached[0] < RULE_STATS_TTL:
+            return cached[1]
+        
         try:
             async with self.pool.acquire() as conn:
-                stats = await conn.fetchrow("""
-                    SELECT 
-                        COUNT(*) as total_rules,
-                        COUNT(*) FILTER (WHERE enabled = TRUE) as enabled_rules,
-                        COUNT(*) FILTER (WHERE tenant_id IS NOT NULL) as tenant_rules,
-                        COUNT(*) FILTER (WHERE user_id IS NOT NULL) as user_rules,
-                        COUNT(DISTINCT resource) as unique_resources,
-                        COUNT(DISTINCT tenant_id) as unique_tenants
-                    FROM rules
-                """)
+                stats = dict(await conn.fetchrow(_RULE_STATS_SQL))
                 
-                return dict(stats)
+                self._stats_cache = (time.monotonic(), stats)
+                return stats
                 
         except Exception as e:
             self.logger.error("Error getting rule stats", error=str(e))
@@ -248,31 +411,36 @@ class PostgreSQLPersistence:
     
     def _row_to_rule(self, row) -> Rule:
         """Convert database row to Rule object."""
+        # Rows are selected in _RULE_COLUMNS order, so unpack by position
+        (rule_id, name, description, resource, action, conditions_data, priority,
+         enabled, tenant_id, user_id, created_at, updated_at, expires_at) = row
+        
         # Deserialize conditions
+        operators = _OPERATORS
         conditions = []
-        for condition_data in row['conditions']:
+        for condition_data in conditions_data:
             condition = RuleCondition(
                 field=condition_data['field'],
-                operator=RuleConditionOperator(condition_data['operator']),
+                operator=operators[condition_data['operator']],
                 value=condition_data['value'],
                 description=condition_data.get('description')
             )
             conditions.append(condition)
         
         return Rule(
-            rule_id=row['rule_id'],
-            name=row['name'],
-            description=row['description'],
-            resource=RuleResource(row['resource']),
-            action=RuleAction(row['action']),
+            rule_id=rule_id,
+            name=name,
+            description=description,
+            resource=_RESOURCES[resource],
+            action=_ACTIONS[action],
             conditions=conditions,
-            priority=row['priority'],
-            enabled=row['enabled'],
-            tenant_id=row['tenant_id'],
-            user_id=row['user_id'],
-            created_at=row['created_at'],
-            updated_at=row['updated_at'],
-            expires_at=row['expires_at']
+            priority=priority,
+            enabled=enabled,
+            tenant_id=tenant_id,
+            user_id=user_id,
+            created_at=created_at,
+            updated_at=updated_at,
+            expires_at=expires_at
         )
     
     async def health_check(self) -> bool:
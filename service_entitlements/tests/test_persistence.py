@@ -0,0 +1,229 @@
+"""
+Unit tests for Entitlements PostgreSQL persistence.
+"""
+
+import json
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from service_entitlements.app.persistence.postgres import (
+    PostgreSQLPersistence, BULK_COPY_THRESHOLD, _rule_record,
+    _encode_jsonb, _decode_jsonb
+)
+from service_entitlements.app.rules.models import (
+    Rule, RuleCondition, RuleConditionOperator, RuleAction, RuleResource
+)
+
+
+def _make_rule(rule_id, name="Test Rule"):
+    """Build a rule with a single tenant condition."""
+    return Rule(
+        rule_id=rule_id,
+        name=name,
+        resource=RuleResource.CURVE,
+        action=RuleAction.ALLOW,
+        conditions=[
+            RuleCondition(
+                field="tenant_id",
+                operator=RuleConditionOperator.EQUALS,
+                value="tenant-1"
+            )
+        ],
+        priority=100,
+        tenant_id="tenant-1"
+    )
+
+
+def _row_for(rule):
+    """Build the row a load query returns for a saved rule."""
+    row = list(_rule_record(rule))
+    row[5] = json.loads(row[5])
+    return tuple(row)
+
+
+class TestPostgreSQLPersistence:
+    """Test cases for PostgreSQLPersistence."""
+
+    @pytest.fixture
+    def conn(self):
+        """Mock asyncpg connection."""
+        conn = MagicMock()
+        conn.execute = AsyncMock()
+        conn.executemany = AsyncMock()
+        conn.copy_records_to_table = AsyncMock()
+        conn.fetch = AsyncMock(return_value=[])
+        conn.fetchval = AsyncMock(return_value=None)
+        conn.fetchrow = AsyncMock(return_value={"total_rules": 3, "enabled_rules": 2})
+
+        @asynccontextmanager
+        async def _transaction():
+            yield
+
+        conn.transaction = _transaction
+        return conn
+
+    @pytest.fixture
+    def persistence(self, conn):
+        """Create PostgreSQLPersistence over a mock pool."""
+        persistence = PostgreSQLPersistence("postgresql://mock/entitlements")
+
+        @asynccontextmanager
+        async def _acquire():
+            yield conn
+
+        persistence.pool = MagicMock()
+        persistence.pool.acquire = _acquire
+        return persistence
+
+    def test_row_to_rule_round_trip(self, persistence):
+        """Test a row in column order converts back to the saved rule."""
+        rule = _make_rule("rule-1")
+        row = _row_for(rule)
+
+        # Test
+        result = persistence._row_to_rule(row)
+
+        # Assertions
+        assert result == rule
+
+    def test_rule_record_serializes_conditions(self):
+        """Test conditions are passed to Postgres as JSON text."""
+        rule = _make_rule("rule-1")
+
+        # Test
+        record = _rule_record(rule)
+
+        # Assertions
+        assert json.loads(record[5]) == [
+            {"field": "tenant_id", "operator": "equals", "value": "tenant-1", "description": None}
+        ]
+
+    def test_jsonb_codec_round_trip(self):
+        """Test the binary jsonb codec carries the version byte both ways."""
+        encoded = _encode_jsonb('[{"field": "tenant_id"}]')
+
+        # Assertions
+        assert encoded[:1] == b"\x01"
+        assert _decode_jsonb(encoded) == [{"field": "tenant_id"}]
+
+    @pytest.mark.asyncio
+    async def test_save_rules_small_batch_uses_executemany(self, persistence, conn):
+        """Test small batches are written with one executemany call."""
+        rules = [_make_rule("rule-1"), _make_rule("rule-2")]
+
+        # Test
+        result = await persistence.save_rules(rules)
+
+        # Assertions
+        assert result is True
+        conn.executemany.assert_awaited_once()
+        records = conn.executemany.await_args.args[1]
+        assert [record[0] for record in records] == ["rule-1", "rule-2"]
+        conn.copy_records_to_table.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_save_rules_large_batch_uses_copy(self, persistence, conn):
+        """Test large batches are staged with COPY and merged in one statement."""
+        rules = [_make_rule(f"rule-{i}") for i in range(BULK_COPY_THRESHOLD)]
+
+        # Test
+        result = await persistence.save_rules(rules)
+
+        # Assertions
+        assert result is True
+        conn.executemany.assert_not_awaited()
+        conn.copy_records_to_table.assert_awaited_once()
+        assert len(conn.copy_records_to_table.await_args.kwargs["records"]) == BULK_COPY_THRESHOLD
+        assert conn.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_save_rules_last_duplicate_wins(self, persistence, conn):
+        """Test repeated rule IDs collapse to the last rule in the batch."""
+        rules = [_make_rule("rule-1", name="First"), _make_rule("rule-1", name="Second")]
+
+        # Test
+        await persistence.save_rules(rules)
+
+        # Assertions
+        records = conn.executemany.await_args.args[1]
+        assert len(records) == 1
+        assert records[0][1] == "Second"
+
+    @pytest.mark.asyncio
+    async def test_save_rules_failure(self, persistence, conn):
+        """Test a failed batch reports failure instead of raising."""
+        conn.executemany.side_effect = Exception("Database error")
+
+        # Test
+        result = await persistence.save_rules([_make_rule("rule-1")])
+
+        # Assertions
+        assert result is False
+
+    @pytest.mark.asyncio
+    async def test_load_rules_matching_field(self, persistence, conn):
+        """Test field lookups query conditions by JSONB containment."""
+        rule = _make_rule("rule-1")
+        conn.fetch.return_value = [_row_for(rule)]
+
+        # Test
+        result = await persistence.load_rules_matching_field("tenant_id")
+
+        # Assertions
+        assert result == [rule]
+        query, param = conn.fetch.await_args.args
+        assert "conditions @> $1::jsonb" in query
+        assert json.loads(param) == [{"field": "tenant_id"}]
+
+    @pytest.mark.asyncio
+    async def test_rule_stats_cached(self, persistence, conn):
+        """Test rule stats and count share one cached aggregate query."""
+        # Test
+        stats = await persistence.get_rule_stats()
+        count = await persistence.get_rule_count()
+
+        # Assertions
+        assert stats["total_rules"] == 3
+        assert count == 3
+        conn.fetchrow.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_rule_stats_invalidated_on_save(self, persistence, conn):
+        """Test saving rules drops cached stats."""
+        await persistence.get_rule_stats()
+
+        # Test
+        await persistence.save_rules([_make_rule("rule-1")])
+        await persistence.get_rule_stats()
+
+        # Assertions
+        assert conn.fetchrow.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_delete_rule_uses_returned_id(self, persistence, conn):
+        """Test deletion succeeds only when a row is returned."""
+        conn.fetchval.return_value = "rule-1"
+
+        # Test and assert
+        assert await persistence.delete_rule("rule-1") is True
+
+        conn.fetchval.return_value = None
+        assert await persistence.delete_rule("missing") is False
+
+    @pytest.mark.asyncio
+    async def test_delete_rules_batch(self, persistence, conn):
+        """Test batch deletes run as one statement and report deleted IDs."""
+        conn.fetch.return_value = [("rule-1",)]
+
+        # Test
+        result = await persistence.delete_rules(["rule-1", "missing"])
+
+        # Assertions
+        assert result == {"rule-1"}
+        conn.fetch.assert_awaited_once()
+        assert conn.fetch.await_args.args[1] == ["rule-1", "missing"]
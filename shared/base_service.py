@@ -24,6 +24,13 @@ from shared.errors import AccessLayerException
 class BaseService:
     """Base service class with common functionality."""
     
+    # Response class for routes that return plain values; services may override
+    default_response_class = JSONResponse
+    
+    # uvicorn event loop and HTTP parser; "auto" lets uvicorn pick what is installed
+    uvicorn_loop = "auto"
+    uvicorn_http = "auto"
+    
     def __init__(self, service_name: str, port: int):
         self.service_name = service_name
         self.name = service_name
@@ -60,6 +67,7 @@ class BaseService:
             version="1.0.0",
             docs_url="/docs" if self.config.env == "local" else None,
             redoc_url="/redoc" if self.config.env == "local" else None,
+            default_response_class=self.default_response_class,
         )
     
     def _setup_middleware(self):
@@ -195,5 +203,7 @@ class BaseService:
             self.app,
             host=self.config.host,
             port=self.config.port,
-            log_level=self.config.log_level.lower()
+            log_level=self.config.log_level.lower(),
+            loop=self.uvicorn_loop,
+            http=self.uvicorn_http
         )
@@ -43,6 +43,9 @@ class BaseConfig(BaseSettings):
     redis_url: str = Field(default="redis://localhost:6379/0", env="ACCESS_REDIS_URL")
     clickhouse_url: str = Field(default="http://localhost:8123", env="ACCESS_CLICKHOUSE_URL")
     postgres_dsn: str = Field(default="postgres://localhost:5432/access", env="ACCESS_POSTGRES_DSN")
+    postgres_pool_min_size: int = Field(default=2, env="ACCESS_POSTGRES_POOL_MIN_SIZE")
+    postgres_pool_max_size: int = Field(default=min(32, (os.cpu_count() or 1) * 4), env="ACCESS_POSTGRES_POOL_MAX_SIZE")
+    postgres_statement_cache_size: int = Field(default=1024, env="ACCESS_POSTGRES_STATEMENT_CACHE_SIZE")
     kafka_bootstrap: str = Field(default="localhost:9092", env="ACCESS_KAFKA_BOOTSTRAP")
     cache_warm_concurrency: int = Field(default=5, env="ACCESS_CACHE_WARM_CONCURRENCY")
     
@@ -0,0 +1,37 @@
+"""
+Unit tests for the service manifest validator script.
+"""
+
+import pytest
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+
+from validate_manifests import validate_manifest
+
+
+class TestValidateManifest:
+    """Test cases for validate_manifest."""
+
+    def test_list_manifest_reported_as_error(self, tmp_path):
+        """Test a list-shaped manifest is reported rather than raising."""
+        manifest_path = tmp_path / "service-manifest.yaml"
+        manifest_path.write_text("- a\n- b\n")
+
+        # Test
+        errors = validate_manifest(manifest_path)
+
+        # Assertions
+        assert errors == ["Manifest must be a mapping"]
+
+    def test_empty_manifest_reported_as_error(self, tmp_path):
+        """Test an empty manifest is reported rather than raising."""
+        manifest_path = tmp_path / "service-manifest.yaml"
+        manifest_path.write_text("")
+
+        # Test
+        errors = validate_manifest(manifest_path)
+
+        # Assertions
+        assert errors == ["Manifest must be a mapping"]